@@ -9,14 +9,21 @@ config = context.config
 fileConfig(config.config_file_name)
 import app.models  # 导入所有 model
 from app.models import Base
+from app.backfill import CHECKPOINT_TABLE
 
 target_metadata = Base.metadata
 
+
+# 分块回填的检查点表不属于 model, autogenerate 时忽略
+def include_name(name, type_, parent_names):
+    return not (type_ == "table" and name == CHECKPOINT_TABLE)
+
 # 离线迁移
 def run_migrations_offline():
     context.configure(
         url=config.get_main_option("sqlalchemy.url"),
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
     )
     with context.begin_transaction():
@@ -34,6 +41,9 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_name=include_name,
+            # 每个 revision 单独一个事务, 使用 autocommit_block 分块回填的迁移只提交到它自己
+            transaction_per_migration=True,
         )
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,56 @@
+"""store user role as code
+
+Revision ID: 778dbfeb4c34
+Revises: a703d3360784
+Create Date: 2026-10-17 16:00:41.902317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from app.backfill import copy_swap_column
+
+
+# revision identifiers, used by Alembic.
+revision: str = '778dbfeb4c34'
+down_revision: Union[str, Sequence[str], None] = 'a703d3360784'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 app.models.role_type 的编码一致; 迁移中写死, 不随之后的枚举修改变化
+ROLE_CODES = {'user': 0, 'admin': 1, 'guest': 2}
+ROLE_CODE_COMMENT = '用户角色 0: USER(user) 1: ADMIN(admin) 2: GUEST(guest)'
+ROLE_VALUE_COMMENT = '用户角色 user: USER admin: ADMIN guest: GUEST'
+# 包含 role 的索引; 回填期间保留旧索引, 换列前在新列上建好, 换列后改回原名
+ROLE_INDEXES = {
+    'idx_user_status_role_id': ['status', 'role', 'id'],
+    'idx_user_role_id': ['role', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 新增编码列 -> 按主键分块回填 -> 删除字符串列 -> 改名, 不用一条 ALTER 锁住整张表改类型
+    # 不在 ROLE_CODES 中的值回填为 NULL
+    cases = ' '.join(f"WHEN '{value}' THEN {code}" for value, code in ROLE_CODES.items())
+    copy_swap_column(
+        op, 'user', 'role',
+        sa.Column('role', sa.SmallInteger().with_variant(mysql.TINYINT(unsigned=True), 'mysql'),
+                  nullable=True, comment=ROLE_CODE_COMMENT),
+        f'CASE role {cases} END',
+        name='778dbfeb4c34_user_role', indexes=ROLE_INDEXES, throttle=0.01,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    cases = ' '.join(f"WHEN {code} THEN '{value}'" for value, code in ROLE_CODES.items())
+    copy_swap_column(
+        op, 'user', 'role',
+        sa.Column('role', sa.String(length=20), nullable=True, comment=ROLE_VALUE_COMMENT),
+        f'CASE role {cases} END',
+        name='778dbfeb4c34_user_role_downgrade', indexes=ROLE_INDEXES, throttle=0.01,
+    )
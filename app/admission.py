@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Callable, Optional, Sequence
+
+from app.api_response import fast_api_response
+from app.metrics import CallbackMetric, HistogramVec, registry
+
+# 排队超时或队列已满时返回的业务错误码
+BUSY_ERROR_CODE = 5030
+
+# 不访问数据库的路由前缀, 不受准入控制限制
+DEFAULT_BYPASS_PREFIXES = ("/test", "/metrics", "/internal/", "/docs", "/redoc", "/openapi.json")
+
+
+def busy_response(retry_after: int):
+    """过载时的快速失败响应: 503 + Retry-After"""
+    response = fast_api_response(error_code=BUSY_ERROR_CODE, error_message="server busy, retry later")
+    response.status_code = 503
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+class AdmissionLimiter:
+    """
+    并发上限 + 有界等待队列
+    上限按连接池容量设置, 让请求在这里排队而不是在 SQLAlchemy 连接池里等到 pool_timeout;
+    队列满时立即拒绝, 排队超过 queue_timeout 的请求同样拒绝
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        if limit < 1:
+            raise ValueError("admission limit must be at least 1")
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds = HistogramVec("admission_wait_seconds", "请求在准入队列中的等待时间", ())
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """拿到执行名额返回 True, 被拒绝返回 False; 返回 True 后必须调用 release()"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self.wait_seconds.labels().observe(0.0)
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        start = time.perf_counter()
+        try:
+            # 名额由 release() 直接转交, active 不变
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Python 3.12+ 的 wait_for 基于 asyncio.timeout: 名额可能在超时的同时已经转交过来,
+            # 此时按获准处理, 否则这个名额永远不会被 release
+            if not (future.done() and not future.cancelled()):
+                self.rejected["timeout"] += 1
+                return False
+        except asyncio.CancelledError:
+            # 客户端断开: 如果名额已经转交过来, 还给下一个等待者
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                _discard(self._waiters, future)
+        self.admitted += 1
+        self.wait_seconds.labels().observe(time.perf_counter() - start)
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def _discard(waiters: deque, future: asyncio.Future) -> None:
+    try:
+        waiters.remove(future)
+    except ValueError:
+        pass
+
+
+def register_limiter_metrics(limiter: AdmissionLimiter) -> None:
+    registry.register(CallbackMetric(
+        "admission_active_requests", "已获准执行的请求数", "gauge", (), lambda: {(): limiter.active}))
+    registry.register(CallbackMetric(
+        "admission_queued_requests", "在准入队列中等待的请求数", "gauge", (), lambda: {(): limiter.queued}))
+    registry.register(CallbackMetric(
+        "admission_limit", "并发上限", "gauge", (), lambda: {(): limiter.limit}))
+    registry.register(CallbackMetric(
+        "admission_admitted_total", "获准执行的请求总数", "counter", (), lambda: {(): limiter.admitted}))
+    registry.register(CallbackMetric(
+        "admission_rejected_total", "被拒绝的请求总数", "counter", ("reason",),
+        lambda: {(reason,): count for reason, count in limiter.rejected.items()}))
+    registry.register(limiter.wait_seconds)
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI 中间件: 访问数据库的请求先经过 AdmissionLimiter, 被拒绝时返回 503 和 Retry-After
+    bypass: 按请求判断是否跳过准入控制, 例如进入组提交队列、不直接占用连接的写请求
+    """
+
+    def __init__(self, app, limiter: AdmissionLimiter,
+                 bypass_prefixes: Sequence[str] = DEFAULT_BYPASS_PREFIXES,
+                 retry_after: Optional[int] = None,
+                 bypass: Optional[Callable[[dict], bool]] = None):
+        self.app = app
+        self.limiter = limiter
+        self.bypass_prefixes = tuple(bypass_prefixes)
+        self.retry_after = retry_after or max(1, math.ceil(limiter.queue_timeout))
+        self.bypass = bypass
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.bypass_prefixes) \
+                or (self.bypass is not None and self.bypass(scope)):
+            await self.app(scope, receive, send)
+            return
+        if not await self.limiter.acquire():
+            await busy_response(self.retry_after)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
@@ -1,6 +1,16 @@
 import functools
-from typing import Generic, TypeVar, Optional
+import json
+from decimal import Decimal
+from typing import Any, Generic, TypeVar, Optional
+from pydantic import BaseModel
 from pydantic.generics import GenericModel
+from fastapi.responses import Response
+from sqlalchemy import inspect
+
+try:
+    import orjson
+except ImportError:  # 没有安装 orjson 时退回标准库
+    orjson = None
 
 
 T = TypeVar("T")  # 泛型类型变量
@@ -9,6 +19,10 @@ class APIResponse(GenericModel, Generic[T]):
     error_code: int
     error_message: str
     data: Optional[T] = None  # 可为任意类型，例如 User、List[User] 等
+    next_cursor: Optional[str] = None  # 游标分页: 下一页游标, 没有下一页时为 None
+    prev_cursor: Optional[str] = None  # 游标分页: 上一页游标, 没有上一页时为 None
+    total: Optional[int] = None  # 分页列表: 满足条件的总数, 没有请求时为 None
+    total_mode: Optional[str] = None  # total 的来源: exact / cached / estimated(估计值)
 
 
 class APIBusinessException(Exception):
@@ -22,6 +36,69 @@ def wrap_api_response(data: T, error_code: int = 0, error_message: str = "") ->
     return APIResponse(error_code=error_code, error_message=error_message, data=data)
 
 
+@functools.lru_cache(maxsize=None)
+def _column_keys(model: type) -> tuple:
+    return tuple(attr.key for attr in inspect(model).column_attrs)
+
+
+def _json_default(obj: Any):
+    # ORM 对象只输出列属性, 不触发关系加载
+    if hasattr(type(obj), "__mapper__"):
+        return {key: getattr(obj, key) for key in _column_keys(type(obj))}
+    mapping = getattr(obj, "_mapping", None)  # sqlalchemy Row
+    if mapping is not None:
+        return dict(mapping)
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "keys"):  # RowMapping 等映射类型
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default)
+    return json.dumps(content, default=_json_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """直接把 ORM 对象 / Row 编码为 JSON 字节, 跳过 response_model 的二次校验"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def fast_api_response(data: Any = None, error_code: int = 0, error_message: str = "",
+                      next_cursor: Optional[str] = None,
+                      prev_cursor: Optional[str] = None, total: Optional[int] = None,
+                      total_mode: Optional[str] = None) -> FastJSONResponse:
+    """
+    与 APIResponse 结构相同的快速响应, 用于大列表
+    返回 Response 时 FastAPI 不再按 response_model 校验, response_model 只用于生成文档
+    """
+    return FastJSONResponse({
+        "error_code": error_code,
+        "error_message": error_message,
+        "data": data,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "total": total,
+        "total_mode": total_mode,
+    })
+
+
+def fast_page_response(page) -> FastJSONResponse:
+    # page 为 app.pagination.CursorPage
+    return fast_api_response(page.items, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor,
+                             total=page.total, total_mode=page.total_mode)
+
+
 def handle_return_or_raise(function):
     @functools.wraps(function)
     async def wrapper(*args, **kwargs):
@@ -29,6 +106,7 @@ def handle_return_or_raise(function):
             return_data = await function(*args, **kwargs)
         except APIBusinessException as e:
             return APIResponse(error_code=e.error_code, error_message=e.error_message)
-        print(return_data, '*'*20)
+        if isinstance(return_data, (APIResponse, Response)):
+            return return_data
         return APIResponse(error_code=0, error_message="", data=return_data)
     return wrapper
@@ -0,0 +1,255 @@
+"""
+Alembic 数据迁移用的分块回填工具
+
+整表一条 UPDATE / ALTER 会长时间持有锁, 这里按主键顺序分块处理:
+每块一个短事务, 块之间可以暂停(给复制延迟和在线流量让路), 每块完成后写入检查点,
+中断后再次执行迁移会从检查点继续; 全部完成后删除检查点
+
+在迁移中使用(autocommit_block 让每条语句单独提交, 不在 Alembic 的大事务里执行):
+
+    from app.backfill import update_in_chunks
+
+    def upgrade():
+        op.add_column("user", sa.Column("role_code", sa.SmallInteger()))
+        with op.get_context().autocommit_block():
+            update_in_chunks(op.get_bind(), "user", "role_code = CASE role WHEN 'admin' THEN 1 ELSE 0 END",
+                             name="user_role_code", throttle=0.05)
+
+回填本身必须是幂等的: 某一块写完但检查点还没写入时中断, 恢复后这一块会再执行一次
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger("app.backfill")
+
+# 检查点表, alembic/env.py 的 autogenerate 会忽略它
+CHECKPOINT_TABLE = "alembic_backfill_checkpoint"
+DEFAULT_CHUNK_SIZE = 1000
+
+_checkpoint_metadata = sa.MetaData()
+checkpoint_table = sa.Table(
+    CHECKPOINT_TABLE,
+    _checkpoint_metadata,
+    sa.Column("name", sa.String(191), primary_key=True),
+    sa.Column("last_key", sa.String(255), nullable=False),  # JSON 编码, 主键可以是整数或字符串
+    sa.Column("rows_done", sa.BigInteger, nullable=False),
+    sa.Column("chunks_done", sa.Integer, nullable=False),
+    sa.Column("updated_at", sa.Float, nullable=False),
+)
+
+
+@dataclass
+class BackfillProgress:
+    name: str
+    chunks: int  # 已完成的块数(含恢复前)
+    rows: int  # 已处理的行数(含恢复前)
+    last_key: Any
+    fraction: Optional[float]  # 按主键范围估算的完成比例, 主键不是数字时为 None
+    elapsed: float  # 本次执行的秒数
+    eta: Optional[float]  # 预计剩余秒数
+
+    def __str__(self) -> str:
+        percent = f"{self.fraction:.1%}" if self.fraction is not None else "?"
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "?"
+        return (f"backfill {self.name}: {percent} chunks={self.chunks} rows={self.rows} "
+                f"last_key={self.last_key!r} elapsed={self.elapsed:.1f}s eta={eta}")
+
+
+def _log_progress(progress: BackfillProgress) -> None:
+    logger.info("%s", progress)
+
+
+def load_checkpoint(connection: Connection, name: str) -> Optional[dict]:
+    if not sa.inspect(connection).has_table(CHECKPOINT_TABLE):
+        return None
+    row = connection.execute(
+        sa.select(checkpoint_table).where(checkpoint_table.c.name == name)
+    ).mappings().first()
+    if row is None:
+        return None
+    return {"last_key": json.loads(row["last_key"]), "rows_done": row["rows_done"],
+            "chunks_done": row["chunks_done"]}
+
+
+def _save_checkpoint(connection: Connection, name: str, last_key: Any, rows: int, chunks: int) -> None:
+    values = {"last_key": json.dumps(last_key), "rows_done": rows, "chunks_done": chunks,
+              "updated_at": time.time()}
+    updated = connection.execute(
+        checkpoint_table.update().where(checkpoint_table.c.name == name).values(**values)
+    ).rowcount
+    if not updated:
+        connection.execute(checkpoint_table.insert().values(name=name, **values))
+
+
+def _clear_checkpoint(connection: Connection, name: str) -> None:
+    connection.execute(checkpoint_table.delete().where(checkpoint_table.c.name == name))
+
+
+def _commit(connection: Connection) -> None:
+    # autocommit_block 中每条语句已经提交; 普通连接上按 "commit as you go" 提交这一块
+    if connection.in_transaction() and connection.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+        connection.commit()
+
+
+def backfill(connection: Connection, table: str,
+             work: Callable[[Connection, Any, Any], int], *,
+             name: Optional[str] = None, key: str = "id",
+             chunk_size: int = DEFAULT_CHUNK_SIZE, throttle: float = 0.0,
+             progress: Optional[Callable[[BackfillProgress], None]] = _log_progress,
+             sleep: Callable[[float], None] = time.sleep) -> int:
+    """
+    按主键顺序分块执行 work(connection, lo, hi), 处理主键在 [lo, hi] 之间的行
+    Args:
+        table: 表名
+        work: 处理一块, 返回影响的行数
+        name: 检查点名称, 默认为表名; 同一张表上有多个回填时必须区分
+        key: 单列主键(或唯一且有索引的列)
+        chunk_size: 每块的行数
+        throttle: 每块之间暂停的秒数
+        progress: 每块完成后的回调, 默认写日志
+    Returns:
+        int: 处理的总行数(含恢复前已完成的部分)
+    """
+    name = name or table
+    t = sa.table(table, sa.column(key))
+    key_column = t.c[key]
+    checkpoint_table.create(connection, checkfirst=True)
+    _commit(connection)
+
+    saved = load_checkpoint(connection, name)
+    last_key = saved["last_key"] if saved else None
+    rows = saved["rows_done"] if saved else 0
+    chunks = saved["chunks_done"] if saved else 0
+    if saved:
+        logger.info("backfill %s: resuming after %r (%d rows done)", name, last_key, rows)
+
+    low, high = connection.execute(sa.select(sa.func.min(key_column), sa.func.max(key_column))).one()
+    numeric = isinstance(low, (int, float)) and isinstance(high, (int, float)) and high > low
+    start = time.perf_counter()
+    rows_at_start = rows
+
+    while True:
+        statement = sa.select(key_column).order_by(key_column).limit(chunk_size)
+        if last_key is not None:
+            statement = statement.where(key_column > last_key)
+        keys = connection.execute(statement).scalars().all()
+        if not keys:
+            break
+        rows += work(connection, keys[0], keys[-1])
+        chunks += 1
+        last_key = keys[-1]
+        _save_checkpoint(connection, name, last_key, rows, chunks)
+        _commit(connection)
+
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            fraction = (last_key - low) / (high - low) if numeric else None
+            done_now = rows - rows_at_start
+            eta = None
+            if fraction and done_now and saved is None:
+                eta = elapsed / fraction - elapsed
+            progress(BackfillProgress(name, chunks, rows, last_key,
+                                      min(fraction, 1.0) if fraction is not None else None, elapsed, eta))
+        if len(keys) < chunk_size:
+            break
+        if throttle > 0:
+            sleep(throttle)
+
+    _clear_checkpoint(connection, name)
+    _commit(connection)
+    return rows
+
+
+def _quoted(connection: Connection, name: str) -> str:
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def update_in_chunks(connection: Connection, table: str, set_sql: str, *,
+                     where_sql: Optional[str] = None, key: str = "id", **kwargs) -> int:
+    """
+    分块执行 UPDATE table SET <set_sql> WHERE key BETWEEN :lo AND :hi [AND <where_sql>]
+    其余参数与 backfill 相同
+    """
+    sql = f"UPDATE {_quoted(connection, table)} SET {set_sql} WHERE {_quoted(connection, key)} BETWEEN :lo AND :hi"
+    if where_sql:
+        sql += f" AND ({where_sql})"
+    statement = sa.text(sql)
+
+    def work(conn: Connection, lo, hi) -> int:
+        return conn.execute(statement, {"lo": lo, "hi": hi}).rowcount
+
+    return backfill(connection, table, work, key=key, **kwargs)
+
+
+def _rename_index(op, table: str, old: str, new: str, columns: Sequence[str]) -> None:
+    connection = op.get_bind()
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        op.execute(f"ALTER TABLE {_quoted(connection, table)} RENAME INDEX {_quoted(connection, old)} "
+                   f"TO {_quoted(connection, new)}")
+    elif dialect == "postgresql":
+        op.execute(f"ALTER INDEX {_quoted(connection, old)} RENAME TO {_quoted(connection, new)}")
+    else:
+        # SQLite 不能改索引名, 重建
+        op.drop_index(old, table_name=table)
+        op.create_index(new, table, list(columns))
+
+
+def copy_swap_column(op, table: str, column: str, new_column: sa.Column, expression_sql: str, *,
+                     key: str = "id", indexes: Optional[Dict[str, Sequence[str]]] = None, **kwargs) -> int:
+    """
+    在线修改列类型: 新增临时列 -> 分块把 expression_sql 的值写入 -> 补齐回填期间的改动 -> 删除旧列 -> 临时列改名
+    代替一条会重写整张表的 ALTER COLUMN; 只处理普通列, 主键/外键列的修改需要单独的方案
+    只回填新列与 expression_sql 不一致的行, 中断后再次执行时跳过已存在的临时列和已写好的行;
+    回填完成后再分块扫描一遍, 补上回填期间新增或修改的行。补齐与换列之间仍有很短的窗口,
+    这段时间内应用需要停止修改该列(或双写两列)
+    Args:
+        op: alembic.op
+        new_column: 新列定义, 名称会被临时改为 <column>__new
+        expression_sql: 由旧列计算新值的 SQL 表达式, 例如 "CAST(role AS INTEGER)"
+        indexes: 包含该列的索引 {名称: 列}; 回填期间旧索引保留, 换列前在临时列上建好 <名称>__new,
+            换列时删除旧索引, 换列后改回原名
+    Returns:
+        int: 回填和补齐写入的行数
+    """
+    temp_name = f"{column}__new"
+    temp_column = new_column._copy()
+    temp_column.name = temp_name
+    temp_column.key = temp_name
+    nullable = new_column.nullable
+    temp_column.nullable = True  # 回填完成前新列中有空值
+
+    connection = op.get_bind()
+    if temp_name not in {c["name"] for c in sa.inspect(connection).get_columns(table)}:
+        op.add_column(table, temp_column)
+    temp, value = _quoted(connection, temp_name), f"({expression_sql})"
+    # 新列与计算值不一致(含一方为 NULL)的行
+    stale_sql = (f"({temp} IS NULL AND {value} IS NOT NULL) OR ({temp} IS NOT NULL AND {value} IS NULL)"
+                 f" OR {temp} <> {value}")
+    name = kwargs.pop("name", f"{table}.{column}")
+    with op.get_context().autocommit_block():
+        rows = update_in_chunks(connection, table, f"{temp} = {expression_sql}", where_sql=stale_sql,
+                                key=key, name=name, **kwargs)
+        rows += update_in_chunks(connection, table, f"{temp} = {expression_sql}", where_sql=stale_sql,
+                                 key=key, name=f"{name}.catch_up", **kwargs)
+    indexes = indexes or {}
+    existing = {index["name"] for index in sa.inspect(connection).get_indexes(table)}
+    for index_name, columns in indexes.items():
+        if f"{index_name}__new" not in existing:
+            op.create_index(f"{index_name}__new", table,
+                            [temp_name if c == column else c for c in columns])
+        if index_name in existing:
+            op.drop_index(index_name, table_name=table)
+    with op.batch_alter_table(table) as batch:
+        batch.drop_column(column)
+        batch.alter_column(temp_name, new_column_name=column, existing_type=new_column.type,
+                           nullable=nullable, comment=new_column.comment)
+    for index_name, columns in indexes.items():
+        _rename_index(op, table, f"{index_name}__new", index_name, columns)
+    return rows
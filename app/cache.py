@@ -0,0 +1,103 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # 超出容量被淘汰
+    expirations: int = 0  # 超过 TTL 被丢弃
+    invalidations: int = 0  # 写操作主动删除
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class CacheBackend(ABC):
+    """
+    缓存后端接口, 值必须是可序列化的普通数据(dict/int/str), 不能是 ORM 对象
+    方法都是异步的, 共享缓存(例如 Redis)可以直接实现这个接口
+    """
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class LRUTTLCache(CacheBackend):
+    """进程内 LRU + TTL 缓存"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        if self._data.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+    async def clear(self) -> None:
+        self._data.clear()
+
+
+user_cache: CacheBackend = LRUTTLCache()
+
+# session.info 中的读一致性标记, 由 app.database 设置
+# 只读副本上的读可能落后于主库, 结果不能写入共享缓存
+REPLICA_SESSION_KEY = "replica"
+# 读自己写的粘滞窗口内, 直接读数据库, 不读缓存也不与其他请求合并
+READ_YOUR_WRITES_KEY = "read_your_writes"
+
+
+def set_user_cache(backend: CacheBackend) -> None:
+    global user_cache
+    user_cache = backend
+
+
+def get_user_cache() -> CacheBackend:
+    return user_cache
@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.singleflight import SingleFlight
+
+
+class CountMode(str, Enum):
+    EXACT = "exact"  # 每次执行 COUNT(*)
+    CACHED = "cached"  # COUNT(*) 结果缓存 ttl 秒, 写入/删除后失效
+    ESTIMATED = "estimated"  # 数据库的表统计信息, 只适用于不带条件的总数
+
+
+# InnoDB 的 TABLE_ROWS 来自采样, 误差可能达到 40%-50%
+_MYSQL_ESTIMATE_SQL = text(
+    "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+)
+# ANALYZE 之后才有 sqlite_stat1; stat 的第一个数字是该索引(即整张表)的行数
+_SQLITE_HAS_STAT_SQL = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+_SQLITE_ESTIMATE_SQL = text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table")
+
+
+class CountProvider:
+    """
+    分页列表的总数, 三种方式:
+    - exact: 精确, 大表上是一次全索引扫描
+    - cached: 精确值缓存 ttl 秒; 表有写入/删除时整表失效, 并发的未命中只查询一次;
+      筛选条件来自客户端, 每张表最多缓存 max_entries 个条件, 超出时先清理过期项再淘汰最久未使用的
+    - estimated: 表统计信息, 不扫描数据; 带筛选条件或没有统计信息时退回 cached
+    返回值中带上实际使用的方式
+    """
+
+    def __init__(self, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic,
+                 max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._cache: Dict[str, "OrderedDict[Hashable, Tuple[int, float]]"] = {}
+        self._flight = SingleFlight()
+        self.exact_queries = 0
+
+    async def count(self, session: AsyncSession, model, where: Sequence = (),
+                    mode: CountMode = CountMode.CACHED) -> Tuple[int, CountMode]:
+        mode = CountMode(mode)
+        table = model.__table__.name
+        if mode is CountMode.ESTIMATED:
+            if not where:
+                estimate = await self._estimate(session, table)
+                if estimate is not None:
+                    return estimate, CountMode.ESTIMATED
+            mode = CountMode.CACHED
+
+        statement = select(func.count()).select_from(model).where(*where)
+        if mode is CountMode.EXACT:
+            return await self._exact(session, statement), CountMode.EXACT
+
+        compiled = statement.compile(session.bind)
+        key = (str(compiled), tuple(sorted(compiled.params.items())))
+        generation = self._cache.setdefault(table, OrderedDict())
+        cached = generation.get(key)
+        if cached is not None:
+            if cached[1] > self._clock():
+                generation.move_to_end(key)
+                return cached[0], CountMode.CACHED
+            del generation[key]
+        total = await self._flight.do((table, key), lambda: self._exact(session, statement))
+        # 查询期间表被失效过时不写回, 避免把旧值放进新的缓存
+        if self._cache.get(table) is generation:
+            self._store(generation, key, total)
+        return total, CountMode.CACHED
+
+    def _store(self, generation: "OrderedDict[Hashable, Tuple[int, float]]", key: Hashable, total: int) -> None:
+        now = self._clock()
+        generation[key] = (total, now + self.ttl)
+        generation.move_to_end(key)
+        if len(generation) <= self.max_entries:
+            return
+        for expired in [k for k, (_, expires) in generation.items() if expires <= now]:
+            del generation[expired]
+        while len(generation) > self.max_entries:
+            generation.popitem(last=False)
+
+    def invalidate(self, table: str) -> None:
+        self._cache.pop(table, None)
+
+    async def _exact(self, session: AsyncSession, statement) -> int:
+        self.exact_queries += 1
+        return (await session.exec(statement)).scalar_one()
+
+    async def _estimate(self, session: AsyncSession, table: str) -> Optional[int]:
+        dialect = session.bind.dialect.name
+        if dialect == "mysql":
+            values = (await session.exec(_MYSQL_ESTIMATE_SQL, params={"table": table})).scalars().all()
+        elif dialect == "sqlite":
+            if (await session.exec(_SQLITE_HAS_STAT_SQL)).first() is None:
+                return None
+            stats = (await session.exec(_SQLITE_ESTIMATE_SQL, params={"table": table})).scalars().all()
+            values = [int(stat.split()[0]) for stat in stats]
+        else:
+            return None
+        values = [int(v) for v in values if v is not None]
+        return max(values) if values else None
+
+
+# 用户列表使用的总数提供者
+count_provider = CountProvider()
+
+
+def set_count_provider(provider: CountProvider) -> None:
+    global count_provider
+    count_provider = provider
+
+
+def get_count_provider() -> CountProvider:
+    return count_provider
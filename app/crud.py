@@ -1,39 +1,368 @@
-from typing import List, Optional
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from sqlmodel import select
+from sqlalchemy import and_, delete, insert, inspect, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import User, StatusEnum, RoleEnum
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import User, Team, TeamMate, StatusEnum, RoleEnum
+from app import statements
+from app.pagination import CursorPage, keyset_paginate, DEFAULT_PAGE_SIZE
+from app.cache import READ_YOUR_WRITES_KEY, REPLICA_SESSION_KEY, get_user_cache
+from app.counts import CountMode, get_count_provider
+from app.singleflight import SingleFlight
+from app.uow import commit_or_flush, rollback_unless_in_unit_of_work, after_commit, in_unit_of_work
+
+# 可用于游标分页的排序方式, 最后一列必须是主键用于打破平局
+USER_SORT_COLUMNS = {
+    "id": (User.id,),
+    "name": (User.name, User.id),
+}
+
+# LIKE 的转义字符
+LIKE_ESCAPE = "\\"
+
+
+# crud 读操作共用的请求合并器, key 带上实体前缀避免冲突, 例如 ("user:1", engine)
+read_flight = SingleFlight()
+
+def _user_cache_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+# 正在从数据库读取、准备写入缓存的 key -> 各次读取的令牌
+# 写操作提交后整体移除该 key 的令牌: 提交前开始的读取可能读到旧值, 不再写入缓存
+_user_cache_fills: Dict[str, Set[object]] = {}
+
+def _start_user_cache_fill(key: str) -> object:
+    token = object()
+    _user_cache_fills.setdefault(key, set()).add(token)
+    return token
+
+def _finish_user_cache_fill(key: str, token: object) -> bool:
+    """读取期间该 key 没有被写操作失效时返回 True"""
+    tokens = _user_cache_fills.get(key)
+    if tokens is None or token not in tokens:
+        return False
+    tokens.discard(token)
+    if not tokens:
+        del _user_cache_fills[key]
+    return True
+
+def _invalidate_user_cache_fills(key: str) -> None:
+    _user_cache_fills.pop(key, None)
+
+def _user_snapshot(user: User) -> dict:
+    # 缓存里只放列值, 不放 ORM 对象
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
 
 async def create_user(session: AsyncSession, name: str,
                       status: StatusEnum = StatusEnum.PENDING,
                       role: RoleEnum = RoleEnum.USER) -> User:
     user = User(name=name, status=status.value, role=role.value)
     session.add(user)
-    await session.commit()
+    await commit_or_flush(session)
     await session.refresh(user)
+    await _refresh_user_cache(session, user.id, user)
+    await _invalidate_user_counts(session)
     return user
 
+# 多行 INSERT 每条语句的行数, 过大会超出 max_allowed_packet / SQLite 变量上限
+BULK_INSERT_CHUNK_SIZE = 500
+
+async def create_users(session: AsyncSession,
+                       users: Iterable[Tuple[str, StatusEnum, RoleEnum]],
+                       chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> List[int]:
+    """
+    批量创建用户, 整批在一个事务中提交, 每 chunk_size 行一条多行 INSERT
+    Args:
+        users: (name, status, role) 序列
+        chunk_size: 每条 INSERT 语句包含的行数
+    Returns:
+        List[int]: 按输入顺序返回新用户的 id
+    """
+    rows = [{"name": name, "status": StatusEnum(status).value, "role": RoleEnum(role).value}
+            for name, status, role in users]
+    if not rows:
+        return []
+    use_returning = session.bind.dialect.insert_returning
+    ids: List[int] = []
+    try:
+        if not use_returning:
+            # 多主 / Galera 集群中 auto_increment_increment 不为 1, 同一条 INSERT 的 id 按该步长递增
+            increment = (await session.exec(text("SELECT @@auto_increment_increment"))).scalar_one()
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if use_returning:
+                # SQLite / MariaDB / PostgreSQL: RETURNING 直接带回 id
+                # RETURNING 的行序没有保证, 自增 id 与 VALUES 顺序一致, 排序即可对应
+                result = await session.exec(insert(User).values(chunk).returning(User.id))
+                ids.extend(sorted(result.scalars().all()))
+            else:
+                # MySQL: 单条多行 INSERT 的自增 id 按步长连续分配, LAST_INSERT_ID() 为第一行的 id
+                result = await session.exec(insert(User).values(chunk))
+                ids.extend(range(result.lastrowid, result.lastrowid + len(chunk) * increment, increment))
+        await commit_or_flush(session)
+    except Exception:
+        await rollback_unless_in_unit_of_work(session)
+        raise
+    await _invalidate_user_counts(session)
+    return ids
+
+async def _load_user_snapshot(session: AsyncSession, user_id: int) -> Optional[dict]:
+    key = _user_cache_key(user_id)
+    # 在 SELECT 之前登记: 查询返回后、写入缓存前提交的写操作会让这次结果作废
+    token = _start_user_cache_fill(key)
+    try:
+        result = await session.exec(statements.USER_BY_ID, params={"user_id": user_id})
+        user = result.first()
+    finally:
+        fresh = _finish_user_cache_fill(key, token)
+    if user is None:
+        return None
+    data = _user_snapshot(user)
+    # 只读副本可能落后于主库(例如刚删除的用户), 只用主库读到的数据填充缓存
+    if fresh and not session.info.get(REPLICA_SESSION_KEY):
+        await get_user_cache().set(key, data)
+    return data
+
+def _bypass_user_cache(session: AsyncSession) -> bool:
+    # 粘滞窗口内要读到自己的写入; 工作单元中可能有未提交的修改, 缓存里还是旧值,
+    # 读到的未提交数据也不能通过 read_flight 共享给其他 session
+    return bool(session.info.get(READ_YOUR_WRITES_KEY)) or in_unit_of_work(session)
+
 async def get_user(session: AsyncSession, user_id: int) -> Optional[User]:
-    result = await session.exec(select(User).where(User.id == user_id))
-    return result.first()
+    if _bypass_user_cache(session):
+        # 直接查询; session 中已加载的对象(包括本事务中的修改)原样返回, 不会被缓存快照覆盖
+        return (await session.exec(statements.USER_BY_ID, params={"user_id": user_id})).first()
+    key = _user_cache_key(user_id)
+    data = await get_user_cache().get(key)
+    if data is None:
+        # 同一个 id、同一个库的并发未命中只查询一次数据库, 其余请求共享列值快照
+        data = await read_flight.do((key, session.bind), lambda: _load_user_snapshot(session, user_id))
+        if data is None:
+            return None
+    # 先标记为 detached, 再 merge(load=False) 挂到当前 session, 不访问数据库
+    user = User(**data)
+    make_transient_to_detached(user)
+    return await session.merge(user, load=False)
 
 async def list_users(session: AsyncSession) -> List[User]:
     result = await session.exec(select(User))
     return result.all()
 
+# 流式导出时每批从服务端游标取回的行数
+STREAM_BATCH_SIZE = 1000
+
+async def stream_users(session: AsyncSession,
+                       batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Sequence]:
+    """
+    按批流式读取全部用户, 内存占用与表大小无关
+    只查询列而不是 User 实体, 行不会进入 session 的 identity map
+    """
+    statement = (
+        select(User.id, User.name, User.status, User.role)
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(statement)
+    async for rows in result.partitions():
+        yield rows
+
+def _name_prefix_clause(dialect_name: str, prefix: str):
+    """
+    名称前缀匹配, 生成能走 idx_user_name_id 范围扫描的条件
+    MySQL: LIKE 'prefix%' (模式在 Python 中拼好, 常量前缀才会被优化为范围扫描), 大小写规则跟随列的排序规则
+    SQLite: LIKE 默认不区分大小写, 不能用 BINARY 索引, 改写为 name >= prefix AND name < 后继字符串
+    """
+    if dialect_name == "sqlite":
+        upper = _prefix_upper_bound(prefix)
+        clause = User.name >= prefix
+        return clause if upper is None else and_(clause, User.name < upper)
+    escaped = (prefix.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+               .replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_"))
+    return User.name.like(escaped + "%", escape=LIKE_ESCAPE)
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    # 以 prefix 开头的字符串都小于它: 去掉末尾无法再加一的字符, 再把最后一个字符加一
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+async def list_users_page(session: AsyncSession, limit: int = DEFAULT_PAGE_SIZE,
+                          cursor: Optional[str] = None, order_by: str = "id",
+                          desc: bool = False, status: Optional[StatusEnum] = None,
+                          role: Optional[RoleEnum] = None,
+                          name_prefix: Optional[str] = None,
+                          count: Optional[CountMode] = None) -> CursorPage[User]:
+    """
+    按条件筛选的用户分页列表, 只支持白名单中的筛选条件和排序方式
+    Args:
+        status / role: 等值筛选, 走 idx_user_status_role_id / idx_user_role_id
+        name_prefix: 名称前缀, 走 idx_user_name_id 范围扫描
+        count: 需要总数时指定方式, 默认不计算总数
+    """
+    if order_by not in USER_SORT_COLUMNS:
+        raise ValueError(f"unsupported order_by: {order_by}")
+    where = []
+    if status is not None:
+        where.append(User.status == StatusEnum(status).value)
+    if role is not None:
+        where.append(User.role == RoleEnum(role).value)
+    if name_prefix:
+        where.append(_name_prefix_clause(session.bind.dialect.name, name_prefix))
+    page = await keyset_paginate(session, select(User).where(*where), USER_SORT_COLUMNS[order_by],
+                                 limit, cursor, order_name=order_by, descending=desc)
+    if count is not None:
+        page.total, mode = await get_count_provider().count(session, User, where, count)
+        page.total_mode = mode.value
+    return page
+
+async def _refresh_user_cache(session: AsyncSession, user_id: int, user: Optional[User]) -> None:
+    # 立即取快照, 事务提交后再写入缓存
+    key = _user_cache_key(user_id)
+    data = _user_snapshot(user) if user is not None else None
+
+    async def refresh():
+        _invalidate_user_cache_fills(key)
+        if data is None:
+            await get_user_cache().delete(key)
+        else:
+            await get_user_cache().set(key, data)
+    await after_commit(session, refresh)
+
+async def _invalidate_user_counts(session: AsyncSession) -> None:
+    # 新增/删除/改角色都会改变列表总数, 提交后整表失效
+    async def invalidate():
+        get_count_provider().invalidate(User.__tablename__)
+    await after_commit(session, invalidate)
+
 async def update_user_role(session: AsyncSession, user_id: int, new_role: RoleEnum) -> Optional[User]:
-    user = await get_user(session, user_id)
-    if not user:
+    params = {"user_id": user_id, "new_role": RoleEnum(new_role).value}
+    if session.bind.dialect.update_returning:
+        # SQLite / PostgreSQL: UPDATE ... RETURNING 一次往返拿到更新后的行
+        # MariaDB 只有 INSERT / DELETE 支持 RETURNING, update_returning 为 False, 与 MySQL 走下面的分支
+        result = await session.exec(statements.UPDATE_USER_ROLE_RETURNING, params=params)
+        user = result.scalars().first()
+        # 返回的是 identity map 中已有的对象时, 属性不会被 RETURNING 覆盖
+        statements.sync_loaded_user(session, user_id, role=params["new_role"])
+        await commit_or_flush(session)
+        await _refresh_user_cache(session, user_id, user)
+        if user is not None:
+            await _invalidate_user_counts(session)
+        return user
+    # MySQL / MariaDB 的 UPDATE 不支持 RETURNING, 由 rowcount 判断是否存在(驱动开启了 CLIENT_FOUND_ROWS, 值未变化也计数)
+    result = await session.exec(statements.UPDATE_USER_ROLE, params=params)
+    await commit_or_flush(session)
+    if result.rowcount == 0:
+        await _refresh_user_cache(session, user_id, None)
         return None
-    user.role = new_role
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    # 已在 identity map 中的对象直接同步, 不会再查询
+    user = statements.sync_loaded_user(session, user_id, role=params["new_role"])
+    if user is None:
+        user = await session.get(User, user_id)
+    await _refresh_user_cache(session, user_id, user)
+    await _invalidate_user_counts(session)
     return user
 
 async def delete_user(session: AsyncSession, user_id: int) -> bool:
-    user = await get_user(session, user_id)
-    if not user:
-        return False
-    await session.delete(user)
-    await session.commit()
-    return True
\ No newline at end of file
+    result = await session.exec(statements.DELETE_USER, params={"user_id": user_id})
+    await commit_or_flush(session)
+    statements.sync_loaded_user(session, user_id, deleted=True)
+    await _refresh_user_cache(session, user_id, None)
+    if result.rowcount > 0:
+        await _invalidate_user_counts(session)
+    return result.rowcount > 0
+
+async def create_team(session: AsyncSession, name: str) -> Team:
+    team = Team(name=name)
+    session.add(team)
+    await commit_or_flush(session)
+    return team
+
+async def get_team(session: AsyncSession, team_id: int) -> Optional[Team]:
+    return await session.get(Team, team_id)
+
+async def list_team_members(session: AsyncSession, team_id: int) -> List[User]:
+    # 一条 JOIN 取回全部成员, 成员数量不影响查询次数
+    result = await session.exec(statements.TEAM_MEMBERS, params={"team_id": team_id})
+    return result.all()
+
+async def list_user_teams(session: AsyncSession, user_id: int) -> List[Team]:
+    result = await session.exec(statements.USER_TEAMS, params={"user_id": user_id})
+    return result.all()
+
+async def is_team_member(session: AsyncSession, team_id: int, user_id: int) -> bool:
+    result = await session.exec(statements.TEAM_MEMBERSHIP, params={"team_id": team_id, "user_id": user_id})
+    return result.first() is not None
+
+def _insert_members_ignoring_duplicates(dialect_name: str):
+    """
+    只忽略 (user_id, team_id) 唯一索引冲突的 INSERT; 外键、截断等错误照常报错
+    MySQL 的 INSERT IGNORE 会把这些错误也降级为警告, 不存在的用户会被静默丢弃
+    """
+    if dialect_name == "mysql":
+        statement = mysql_insert(TeamMate)
+        return statement.on_duplicate_key_update(team_id=statement.inserted.team_id)
+    if dialect_name == "postgresql":
+        return postgresql_insert(TeamMate).on_conflict_do_nothing(index_elements=["user_id", "team_id"])
+    return sqlite_insert(TeamMate).on_conflict_do_nothing(index_elements=["user_id", "team_id"])
+
+async def add_team_members(session: AsyncSession, team_id: int, user_ids: Iterable[int],
+                           chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> int:
+    """
+    批量加入团队成员, 已经是成员的由唯一索引忽略
+    用户必须存在: 路由先用加载器确认; MySQL 上外键错误会抛出, SQLite 默认不检查外键
+    Returns:
+        int: 实际新增的成员数
+    """
+    user_ids = sorted(set(user_ids))
+    dialect_name = session.bind.dialect.name
+    statement = _insert_members_ignoring_duplicates(dialect_name)
+    added = 0
+    try:
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            if dialect_name == "mysql":
+                # 驱动开启了 CLIENT_FOUND_ROWS, 重复行在 ON DUPLICATE KEY UPDATE 中也计为 1,
+                # 先排除已有成员(走 idx_teammate_team_id_user_id), rowcount 才是新增数
+                existing = await session.exec(
+                    select(TeamMate.user_id).where(TeamMate.team_id == team_id, TeamMate.user_id.in_(chunk))
+                )
+                members = set(existing.all())
+                chunk = [user_id for user_id in chunk if user_id not in members]
+                if not chunk:
+                    continue
+            result = await session.exec(statement.values([{"user_id": user_id, "team_id": team_id}
+                                                           for user_id in chunk]))
+            added += result.rowcount
+        await commit_or_flush(session)
+    except Exception:
+        await rollback_unless_in_unit_of_work(session)
+        raise
+    return added
+
+async def remove_team_members(session: AsyncSession, team_id: int, user_ids: Iterable[int],
+                              chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> int:
+    """
+    批量移出团队成员
+    Returns:
+        int: 实际删除的成员数
+    """
+    user_ids = sorted(set(user_ids))
+    removed = 0
+    try:
+        for start in range(0, len(user_ids), chunk_size):
+            result = await session.exec(
+                delete(TeamMate).where(
+                    TeamMate.user_id.in_(user_ids[start:start + chunk_size]),
+                    TeamMate.team_id == team_id,
+                )
+            )
+            removed += result.rowcount
+        await commit_or_flush(session)
+    except Exception:
+        await rollback_unless_in_unit_of_work(session)
+        raise
+    return removed
@@ -0,0 +1,44 @@
+import json
+from typing import AsyncIterator
+
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import stream_users
+
+EXPORT_COLUMNS = ("id", "name", "status", "role")
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows
+    ).encode("utf-8")
+
+
+def _encode_csv(rows) -> bytes:
+    # 只有导出 CSV 时才用到, 延迟导入
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_users(fmt: str, batch_size: int, session_factory: sessionmaker) -> AsyncIterator[bytes]:
+    """
+    以 NDJSON 或 CSV 分块输出全部用户, 每批数据库行编码为一个响应块
+    生成器自己持有 session, 保证响应发送期间连接一直可用
+    Args:
+        session_factory: 只读 sessionmaker, 由路由按读写分离规则选择(通常是只读副本)
+    """
+    encode = _encode_ndjson if fmt == "ndjson" else _encode_csv
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode("utf-8")
+    async with session_factory() as session:
+        async for rows in stream_users(session, batch_size):
+            yield encode(rows)
@@ -0,0 +1,161 @@
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.crud import create_users
+from app.models import RoleEnum, StatusEnum, User
+
+# 默认攒批时间(秒)和每批最大行数
+GROUP_COMMIT_INTERVAL = 0.005
+GROUP_COMMIT_BATCH_SIZE = 500
+
+
+class GroupCommitQueueFull(Exception):
+    """组提交队列已满, 调用方应快速失败(例如返回 503), 不再继续排队"""
+
+
+@dataclass
+class _PendingUser:
+    name: str
+    status: StatusEnum
+    role: RoleEnum
+    future: asyncio.Future
+
+
+class GroupCommitWriter:
+    """
+    组提交: 并发的创建用户请求进入队列, 后台任务每 interval 秒或攒够 batch_size 行时
+    用多行 INSERT 写入并只提交一次, 每个调用方的 future 得到自己的 id 和整行
+    整批失败时逐行重试(各自一个事务), 只有出错的那一行收到异常
+    队列长度有上限(默认 batch_size 的 4 倍), 队列满时 submit 抛出 GroupCommitQueueFull
+    """
+
+    def __init__(self, sessionmaker, interval: float = GROUP_COMMIT_INTERVAL,
+                 batch_size: int = GROUP_COMMIT_BATCH_SIZE, max_queue: int = 0):
+        self.sessionmaker = sessionmaker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue or batch_size * 4
+        self._queue: Optional[asyncio.Queue] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+        self.batches = 0  # 提交的批次数
+        self.rows = 0  # 写入成功的行数
+        self.fallbacks = 0  # 整批失败后逐行重试的批次数
+        self.errors = 0  # 写入失败的行数
+        self.rejected = 0  # 队列已满被拒绝的请求数
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(self.max_queue)
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务, 队列中剩余的请求在返回前写入"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        if self._flushing is not None:
+            await self._flushing
+            self._flushing = None
+        while not self._queue.empty():
+            await self._flush(self._take(self._queue.get_nowait()))
+
+    async def submit(self, name: str, status: StatusEnum = StatusEnum.PENDING,
+                     role: RoleEnum = RoleEnum.USER) -> User:
+        if self._task is None:
+            raise RuntimeError("group commit writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingUser(name, status, role, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise GroupCommitQueueFull(f"group commit queue is full ({self.max_queue})") from None
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        # shield: 调用方被取消时这一行仍会写入, 只是不再等待结果
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+            "rejected": self.rejected,
+        }
+
+    def _take(self, first: _PendingUser) -> List[_PendingUser]:
+        batch = [first]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if self._queue.qsize() < self.batch_size:
+            self._full.clear()
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            try:
+                if self._queue.qsize() + 1 < self.batch_size:
+                    with suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._full.wait(), self.interval)
+            finally:
+                # 攒批期间被 stop() 取消时, 已取出的请求同样要写入
+                self._flushing = asyncio.ensure_future(self._flush(self._take(first)))
+            # shield: stop() 取消后台任务时, 正在写入的这一批仍然完成, 由 stop() 等待
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self, batch: List[_PendingUser]) -> None:
+        try:
+            ids = await self._insert(batch)
+        except Exception:
+            self.fallbacks += 1
+            for item in batch:
+                try:
+                    ids = await self._insert([item])
+                except Exception as e:
+                    self.errors += 1
+                    _resolve(item, exception=e)
+                else:
+                    self.rows += 1
+                    _resolve(item, user_id=ids[0])
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for item, user_id in zip(batch, ids):
+            _resolve(item, user_id=user_id)
+
+    async def _insert(self, batch: List[_PendingUser]) -> List[int]:
+        async with self.sessionmaker() as session:
+            return await create_users(
+                session, [(item.name, item.status, item.role) for item in batch], self.batch_size
+            )
+
+
+def _resolve(item: _PendingUser, user_id: Optional[int] = None,
+             exception: Optional[BaseException] = None) -> None:
+    if item.future.done():
+        return
+    if exception is not None:
+        item.future.set_exception(exception)
+        item.future.exception()  # 调用方已取消时不打印 "never retrieved"
+        return
+    item.future.set_result(User(
+        id=user_id, name=item.name,
+        status=StatusEnum(item.status).value, role=RoleEnum(item.role).value,
+    ))
@@ -0,0 +1,101 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.metrics import HistogramVec, registry
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+request_duration = registry.register(HistogramVec(
+    "http_request_duration_seconds", "HTTP 请求耗时", ("method", "route", "status")))
+db_queries = registry.register(HistogramVec(
+    "db_queries_per_request", "每个请求执行的 SQL 条数", ("method", "route"), COUNT_BUCKETS))
+db_time = registry.register(HistogramVec(
+    "db_time_per_request_seconds", "每个请求在数据库上花费的时间", ("method", "route")))
+db_rows = registry.register(HistogramVec(
+    "db_rows_per_request", "每个请求数据库返回/影响的行数(以驱动的 rowcount 为准)", ("method", "route"),
+    ROW_BUCKETS))
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    scope: Optional[dict] = field(default=None, repr=False)
+
+    @property
+    def route(self) -> Optional[str]:
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', self.scope['path'])}"
+
+
+# 当前请求的统计, 由中间件设置; SQLAlchemy 的 greenlet 会继承调用方的 context
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def current_route() -> Optional[str]:
+    """当前请求的 "方法 路由模板", 不在请求中时为 None"""
+    stats = current_request_stats.get()
+    return stats.route if stats is not None else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        # MySQL 的 SELECT 返回结果集行数; SQLite 只对 DML 返回影响行数, SELECT 为 -1
+        stats.rows += max(cursor.rowcount, 0)
+
+
+def instrument_engine(engine: AsyncEngine) -> AsyncEngine:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+class SQLMetricsMiddleware:
+    """ASGI 中间件: 按路由记录请求耗时、SQL 条数、数据库耗时和行数"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope=scope)
+        token = current_request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            # 用路由模板而不是实际路径作为标签, 避免 /users/1 /users/2 ... 标签爆炸
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            method = scope["method"]
+            request_duration.labels(method, route, status).observe(time.perf_counter() - start)
+            db_queries.labels(method, route).observe(stats.queries)
+            db_time.labels(method, route).observe(stats.db_seconds)
+            db_rows.labels(method, route).observe(stats.rows)
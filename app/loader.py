@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Dict, Generic, Iterable, List, Optional, Set, Type, TypeVar
+
+from sqlalchemy import inspect
+from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+M = TypeVar("M")
+
+# 单条 IN (...) 最多包含的 key 数量
+IN_CHUNK_SIZE = 500
+
+
+class ModelLoader(Generic[M]):
+    """
+    DataLoader 风格的按主键批量加载器, 生命周期为一个请求
+    同一轮事件循环中的 load(key) 会被收集起来, 用一条 SELECT ... WHERE pk IN (...) 一起查询
+    同一个 key 在请求内只查询一次
+    """
+
+    def __init__(self, session: AsyncSession, model: Type[M],
+                 chunk_size: int = IN_CHUNK_SIZE, lock: Optional[asyncio.Lock] = None):
+        self.session = session
+        self.model = model
+        self.chunk_size = chunk_size
+        self._pk = inspect(model).primary_key[0]
+        self._futures: Dict[Any, asyncio.Future] = {}
+        self._queue: List[Any] = []
+        self._scheduled = False
+        # 事件循环只保存任务的弱引用, 这里持有正在执行的查询, 避免查询中途被回收
+        self._tasks: Set[asyncio.Task] = set()
+        # AsyncSession 不能并发执行, 共享 session 的加载器要共用一把锁
+        self._lock = lock or asyncio.Lock()
+        self.queries = 0
+
+    def load(self, key: Any) -> "asyncio.Future[Optional[M]]":
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._queue.append(key)
+        if not self._scheduled:
+            # 推迟到下一轮事件循环, 让本轮所有 load 调用都进入同一批
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[Any]) -> List[Optional[M]]:
+        return list(await asyncio.gather(*[self.load(key) for key in keys]))
+
+    def prime(self, key: Any, value: Optional[M]) -> None:
+        """把已经查到的对象放入加载器, 之后的 load(key) 不再查询"""
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        self._scheduled = False
+        task = asyncio.ensure_future(self._fetch(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, keys: List[Any]) -> None:
+        async with self._lock:
+            for start in range(0, len(keys), self.chunk_size):
+                chunk = keys[start:start + self.chunk_size]
+                try:
+                    result = await self.session.exec(select(self.model).where(self._pk.in_(chunk)))
+                    self.queries += 1
+                    rows = {getattr(row, self._pk.key): row for row in result.all()}
+                except Exception as e:
+                    for key in chunk:
+                        # 失败的 key 不缓存, 之后可以重试
+                        future = self._futures.pop(key)
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for key in chunk:
+                    future = self._futures[key]
+                    if not future.done():
+                        future.set_result(rows.get(key))
+
+
+class LoaderRegistry:
+    """一个请求内按模型复用加载器, 所有加载器共享同一个 session 和锁"""
+
+    def __init__(self, session: AsyncSession, chunk_size: int = IN_CHUNK_SIZE):
+        self.session = session
+        self.chunk_size = chunk_size
+        self._lock = asyncio.Lock()
+        self._loaders: Dict[type, ModelLoader] = {}
+
+    def for_model(self, model: Type[M]) -> ModelLoader[M]:
+        loader = self._loaders.get(model)
+        if loader is None:
+            loader = ModelLoader(self.session, model, self.chunk_size, self._lock)
+            self._loaders[model] = loader
+        return loader
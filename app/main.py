@@ -1,12 +1,80 @@
-from fastapi import FastAPI, Depends, HTTPException
-from typing import List
+from fastapi import FastAPI, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from contextlib import asynccontextmanager
+import math
+from typing import List, Literal, Optional
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.database import get_session
-from app.models import User, RoleEnum, StatusEnum
-from app.crud import create_user, get_user, list_users, update_user_role, delete_user
-from app.api_response import APIResponse, handle_return_or_raise, APIBusinessException
+from sqlalchemy.orm import sessionmaker
+from app.database import get_session, get_read_session, get_read_sessionmaker, get_loaders, get_read_loaders, router, pool_status, settings, init_db
+from app.models import User, Team, RoleEnum, StatusEnum
+from app.crud import (
+    create_user, create_users, get_user, list_users_page, update_user_role, delete_user,
+    BULK_INSERT_CHUNK_SIZE, STREAM_BATCH_SIZE, USER_SORT_COLUMNS,
+    create_team, list_team_members, list_user_teams, is_team_member,
+    add_team_members, remove_team_members,
+)
+from app.api_response import (
+    APIResponse, handle_return_or_raise, APIBusinessException, wrap_api_response,
+    fast_api_response, fast_page_response,
+)
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.export import export_users, EXPORT_MEDIA_TYPES
+from app.cache import LRUTTLCache, get_user_cache, set_user_cache
+from app.counts import CountMode, get_count_provider
+from app.instrumentation import SQLMetricsMiddleware
+from app.admission import AdmissionLimiter, AdmissionControlMiddleware, busy_response, register_limiter_metrics
+from app.metrics import registry, PROMETHEUS_CONTENT_TYPE
+from app.slow_query import slow_query_log
+from app.uow import transactional
+from app.warmup import warm_up
+from app.group_commit import GroupCommitQueueFull, GroupCommitWriter
+from app.loader import LoaderRegistry
+
+# 组提交写入器, 只有开启 APP_DB_GROUP_COMMIT 时才在启动时运行
+user_writer = GroupCommitWriter(
+    router.primary_sessionmaker,
+    settings.group_commit_interval_ms / 1000,
+    settings.group_commit_batch_size,
+    settings.group_commit_queue_size,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 预热完成之前 /internal/ready 返回 503
+    app.state.ready = False
+    if settings.create_tables:
+        await init_db()
+    await warm_up(router, settings.pool_size)
+    if settings.group_commit:
+        user_writer.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    # 先写完组提交队列中剩余的请求再关闭连接
+    await user_writer.stop()
+    await router.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+# 多 worker 时由 app.serve 缩短 TTL, 见 --user-cache-ttl
+set_user_cache(LRUTTLCache(ttl=settings.user_cache_ttl))
+
+
+def _group_commit_request(scope) -> bool:
+    # 组提交开启时 POST /users/ 在写入队列中等待, 不占用连接; 占用准入名额会把每批限制在并发上限以内
+    return user_writer.running and scope["method"] == "POST" and scope["path"] == "/users/"
 
-app = FastAPI()
+
+if settings.admission_control:
+    limit, queue_size = settings.admission_limits()
+    admission_limiter = AdmissionLimiter(limit, queue_size, settings.admission_timeout)
+    register_limiter_metrics(admission_limiter)
+    app.add_middleware(AdmissionControlMiddleware, limiter=admission_limiter, bypass=_group_commit_request)
+else:
+    admission_limiter = None
+# 最后添加的中间件在最外层: 请求耗时包含准入排队时间
+app.add_middleware(SQLMetricsMiddleware)
 
 
 from pydantic import BaseModel
@@ -18,6 +86,24 @@ class UserCreate(BaseModel):
     role: RoleEnum = RoleEnum.USER
 
 
+class UserRead(BaseModel):
+    id: int
+    name: str
+    status: Optional[StatusEnum] = None
+    role: Optional[RoleEnum] = None
+
+    class Config:
+        orm_mode = True
+
+
+class TeamRead(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        orm_mode = True
+
+
 @app.post("/users/", response_model=APIResponse[UserCreate])
 async def api_create_user(
     name: str,
@@ -25,31 +111,82 @@ async def api_create_user(
     role: RoleEnum = RoleEnum.USER,
     session: AsyncSession = Depends(get_session),
 ):
+    if user_writer.running:
+        try:
+            return wrap_api_response(await user_writer.submit(name, status, role))
+        except GroupCommitQueueFull:
+            # 组提交请求不经过准入控制, 由队列长度上限做背压
+            return busy_response(max(1, math.ceil(settings.admission_timeout)))
     return wrap_api_response(await create_user(session, name, status, role))
 
 
-@app.get("/users/{user_id}", response_model=APIResponse[User])
-async def api_get_user(user_id: int, session: AsyncSession = Depends(get_session)):
+# 单次批量创建的最大行数
+MAX_BULK_CREATE_SIZE = 10000
+
+
+@app.post("/users/bulk", response_model=APIResponse[List[int]])
+@handle_return_or_raise
+async def api_create_users(
+    users: List[UserCreate],
+    chunk_size: int = Query(BULK_INSERT_CHUNK_SIZE, ge=1, le=5000),
+    session: AsyncSession = Depends(get_session),
+):
+    if len(users) > MAX_BULK_CREATE_SIZE:
+        raise APIBusinessException(4001, f"too many users, max {MAX_BULK_CREATE_SIZE}")
+    return await create_users(session, [(u.name, u.status, u.role) for u in users], chunk_size)
+
+
+@app.get("/users/export", summary="流式导出全部用户")
+async def api_export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    batch_size: int = Query(STREAM_BATCH_SIZE, ge=1, le=10000),
+    session_factory: sessionmaker = Depends(get_read_sessionmaker),
+):
+    return StreamingResponse(
+        export_users(format, batch_size, session_factory),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"},
+    )
+
+
+@app.get("/users/{user_id}", response_model=APIResponse[UserRead])
+async def api_get_user(user_id: int, session: AsyncSession = Depends(get_read_session)):
     user = await get_user(session, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return wrap_api_response(user)
 
 
-@app.get("/users/", response_model=APIResponse[List[User]])
+@app.get("/users/", response_model=APIResponse[List[UserRead]], summary="按条件筛选的用户分页列表")
 @handle_return_or_raise
-async def api_list_users(session: AsyncSession = Depends(get_session)):
-    return await list_users(session)
+async def api_list_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", description="排序方式: " + ", ".join(USER_SORT_COLUMNS)),
+    desc: bool = False,
+    status: Optional[StatusEnum] = None,
+    role: Optional[RoleEnum] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=20, description="名称前缀"),
+    count: Optional[CountMode] = Query(
+        None, description="返回 total 的方式: exact 精确 / cached 缓存 / estimated 表统计估计值; 不传则不计算"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    try:
+        page = await list_users_page(session, limit, cursor, order_by, desc,
+                                     status=status, role=role, name_prefix=name_prefix, count=count)
+    except ValueError as e:
+        raise APIBusinessException(4000, str(e))
+    return fast_page_response(page)
 
 
-@app.patch("/users/{user_id}/role", response_model=APIResponse[User])
+@app.patch("/users/{user_id}/role", response_model=APIResponse[UserRead])
 async def api_update_role(
     user_id: int, role: RoleEnum, session: AsyncSession = Depends(get_session)
 ):
     user = await update_user_role(session, user_id, role)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return wrap_api_response(user)
 
 
 @app.delete("/users/{user_id}", response_model=APIResponse[bool])
@@ -57,7 +194,133 @@ async def api_delete_user(user_id: int, session: AsyncSession = Depends(get_sess
     success = await delete_user(session, user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"ok": True}
+    return wrap_api_response(True)
+
+
+@app.post("/teams/", response_model=APIResponse[TeamRead])
+@transactional
+async def api_create_team(
+    name: str,
+    member_ids: Optional[List[int]] = Body(None),
+    session: AsyncSession = Depends(get_session),
+    loaders: LoaderRegistry = Depends(get_loaders),
+):
+    # 创建团队和加入初始成员在同一个事务中, 只提交一次
+    if member_ids and len(member_ids) > MAX_BULK_CREATE_SIZE:
+        raise HTTPException(status_code=400, detail=f"too many users, max {MAX_BULK_CREATE_SIZE}")
+    if member_ids:
+        await _ensure_users(loaders, member_ids)
+    team = await create_team(session, name)
+    if member_ids:
+        await add_team_members(session, team.id, member_ids)
+    return wrap_api_response(team)
+
+
+async def _ensure_team(loaders: LoaderRegistry, team_id: int):
+    if not await loaders.for_model(Team).load(team_id):
+        raise HTTPException(status_code=404, detail="Team not found")
+
+
+async def _ensure_users(loaders: LoaderRegistry, user_ids: List[int]):
+    # 一条 IN 查询确认全部用户存在, 不存在的 id 返回给客户端
+    ids = sorted(set(user_ids))
+    users = await loaders.for_model(User).load_many(ids)
+    missing = [user_id for user_id, user in zip(ids, users) if user is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Users not found: {missing}")
+
+
+@app.get("/teams/{team_id}/members", response_model=APIResponse[List[UserRead]])
+async def api_list_team_members(
+    team_id: int,
+    session: AsyncSession = Depends(get_read_session),
+    loaders: LoaderRegistry = Depends(get_read_loaders),
+):
+    await _ensure_team(loaders, team_id)
+    return fast_api_response(await list_team_members(session, team_id))
+
+
+@app.get("/teams/{team_id}/members/{user_id}", response_model=APIResponse[bool])
+async def api_is_team_member(team_id: int, user_id: int, session: AsyncSession = Depends(get_read_session)):
+    return wrap_api_response(await is_team_member(session, team_id, user_id))
+
+
+@app.post("/teams/{team_id}/members", response_model=APIResponse[int])
+async def api_add_team_members(
+    team_id: int, user_ids: List[int],
+    session: AsyncSession = Depends(get_session),
+    loaders: LoaderRegistry = Depends(get_loaders),
+):
+    if len(user_ids) > MAX_BULK_CREATE_SIZE:
+        raise HTTPException(status_code=400, detail=f"too many users, max {MAX_BULK_CREATE_SIZE}")
+    await _ensure_team(loaders, team_id)
+    await _ensure_users(loaders, user_ids)
+    return wrap_api_response(await add_team_members(session, team_id, user_ids))
+
+
+@app.delete("/teams/{team_id}/members", response_model=APIResponse[int])
+async def api_remove_team_members(
+    team_id: int, user_ids: List[int], session: AsyncSession = Depends(get_session)
+):
+    if len(user_ids) > MAX_BULK_CREATE_SIZE:
+        raise HTTPException(status_code=400, detail=f"too many users, max {MAX_BULK_CREATE_SIZE}")
+    return wrap_api_response(await remove_team_members(session, team_id, user_ids))
+
+
+@app.get("/users/{user_id}/teams", response_model=APIResponse[List[TeamRead]])
+async def api_list_user_teams(user_id: int, session: AsyncSession = Depends(get_read_session)):
+    return fast_api_response(await list_user_teams(session, user_id))
+
+
+@app.get("/internal/cache", summary="用户缓存命中统计")
+@handle_return_or_raise
+async def api_cache_stats() -> APIResponse[dict]:
+    return get_user_cache().stats.to_dict()
+
+
+@app.get("/internal/group-commit", summary="组提交队列统计")
+@handle_return_or_raise
+async def api_group_commit_stats() -> APIResponse[dict]:
+    return user_writer.stats()
+
+
+@app.get("/internal/admission", summary="准入控制状态")
+@handle_return_or_raise
+async def api_admission_stats() -> APIResponse[dict]:
+    return admission_limiter.stats() if admission_limiter is not None else {"enabled": False}
+
+
+@app.get("/internal/counts", summary="列表总数缓存统计")
+@handle_return_or_raise
+async def api_count_stats() -> APIResponse[dict]:
+    provider = get_count_provider()
+    return {"ttl": provider.ttl, "exact_queries": provider.exact_queries}
+
+
+@app.get("/internal/pool", summary="数据库连接池状态")
+@handle_return_or_raise
+async def api_pool_stats() -> APIResponse[dict]:
+    status = pool_status(router.primary)
+    status["replicas"] = [pool_status(replica) for replica in router.replicas]
+    return status
+
+
+@app.get("/internal/slow-queries", summary="最近的慢查询及其执行计划")
+@handle_return_or_raise
+async def api_slow_queries(limit: int = Query(100, ge=1, le=500)) -> APIResponse[list]:
+    return slow_query_log.recent(limit)
+
+
+@app.get("/internal/ready", summary="就绪检查, 预热完成后返回 200")
+async def api_ready():
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True}
+
+
+@app.get("/metrics", summary="Prometheus 指标", include_in_schema=False)
+async def api_metrics():
+    return Response(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.get(
@@ -0,0 +1,118 @@
+import bisect
+import threading
+from typing import Callable, Dict, Sequence
+
+# 延迟类指标的默认分桶(秒)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """累计分桶直方图, 分桶语义与 Prometheus 相同(le, 含上界)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        # 连接池事件可能在线程中触发, 加锁保证计数一致
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> Dict[str, int]:
+        result, total = {}, 0
+        for bound, count in zip(self.buckets, self._counts):
+            total += count
+            result[repr(bound)] = total
+        result["+Inf"] = self.count
+        return result
+
+    def snapshot(self) -> dict:
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": self.cumulative()}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class HistogramVec:
+    """按标签区分的一组直方图, 例如按路由统计延迟"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.buckets))
+        return child
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, child in sorted(self._children.items()):
+            pairs = list(zip(self.labelnames, key))
+            for bound, count in child.cumulative().items():
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', bound)])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {child.sum}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {child.count}")
+        return "\n".join(lines)
+
+
+class CallbackMetric:
+    """
+    渲染时才取值的指标(gauge / counter), 值由回调函数给出, 适合导出已有对象上的计数
+    callback 返回 {标签值元组: 数值}, 没有标签时用空元组作为键
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[tuple, float]]):
+        if kind not in ("gauge", "counter"):
+            raise ValueError(f"unsupported metric type: {kind}")
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._families = []
+
+    def register(self, family):
+        self._families.append(family)
+        return family
+
+    def render(self) -> str:
+        """Prometheus 文本格式(version 0.0.4)"""
+        return "\n".join(family.render() for family in self._families) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import Optional
-from sqlalchemy import Column, String, SmallInteger, Integer
+from typing import Dict, Optional
+from sqlalchemy import Column, String, SmallInteger, Integer, Index
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
@@ -25,18 +27,87 @@ class RoleEnum(str, Enum):
     GUEST = "guest"
 
 
-def enum_comment(enum: type[Enum]) -> str:
+def enum_comment(enum: type[Enum], codes: Optional[Dict[str, int]] = None) -> str:
+    # codes: 按编码存储的字符串枚举, 注释中写数据库里的编码
+    if codes is not None:
+        return " ".join([f"{codes[item.value]}: {item.name}({item.value})" for item in enum])
     return " ".join([f"{item.value}: {item.name}" for item in enum])
 
 
+class EnumCode(TypeDecorator):
+    """
+    字符串枚举按 TINYINT 编码存储(SQLite 等为 SMALLINT), 每行和每个包含该列的索引只占 1 字节
+    编码默认按枚举成员的定义顺序从 0 开始, 已有数据后只能在末尾追加成员, 或通过 codes 显式指定
+    写入接受枚举成员或其值, 读出为枚举的值(str), 与按字符串存储时一致; 两个方向都是一次字典查找
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum: type[Enum], codes: Optional[Dict[str, int]] = None):
+        super().__init__()
+        self.enum = enum
+        codes = codes or {item.value: code for code, item in enumerate(enum)}
+        self.codes = tuple(sorted(codes.items(), key=lambda item: item[1]))  # 可哈希, 作为语句缓存键的一部分
+        self._to_code = dict(self.codes)
+        self._to_value = {code: value for value, code in self.codes}
+
+    def comment(self) -> str:
+        return enum_comment(self.enum, self._to_code)
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(mysql.TINYINT(unsigned=True))
+        return dialect.type_descriptor(SmallInteger())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self._to_code[value]  # str 枚举成员与其值的哈希相同, 同一次查找
+        except KeyError:
+            raise ValueError(f"{value!r} is not a valid {self.enum.__name__}") from None
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._to_value[value]
+
+    def bind_processor(self, dialect):
+        # 跳过 TypeDecorator 的通用包装, 直接返回查表函数
+        to_code, enum_name = self._to_code, self.enum.__name__
+
+        def process(value):
+            if value is None:
+                return None
+            try:
+                return to_code[value]
+            except KeyError:
+                raise ValueError(f"{value!r} is not a valid {enum_name}") from None
+        return process
+
+    def result_processor(self, dialect, coltype):
+        # dict 的 __getitem__ 是 C 实现, 每行不产生 Python 函数调用; NULL 也放进表里
+        return {None: None, **self._to_value}.__getitem__
+
+
+role_type = EnumCode(RoleEnum)
+
+
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # 列表筛选: status (+ role) 等值, 按 id 做 keyset 分页
+        Index("idx_user_status_role_id", "status", "role", "id"),
+        Index("idx_user_role_id", "role", "id"),
+        # 名称前缀范围扫描, 以及按名称排序分页
+        Index("idx_user_name_id", "name", "id"),
+    )
 
     id: Optional[int] = Column(Integer, primary_key=True, autoincrement=True)
     # id: Optional[str] = Column(String(length=20), nullable=False, primary_key=True)
     name: str = Column(String(length=20), nullable=False)
     status: StatusEnum = Column(SmallInteger, default=StatusEnum.PENDING, comment=f"用户状态 {enum_comment(StatusEnum)}")
-    role: RoleEnum = Column(String(20), default=RoleEnum.USER, comment=f"用户角色 {enum_comment(RoleEnum)}")
+    role: RoleEnum = Column(role_type, default=RoleEnum.USER, comment=f"用户角色 {role_type.comment()}")
 
 
 
@@ -47,12 +118,14 @@ class Team(Base):
     name: str = Column(String(length=20), nullable=False)
 
 
-from sqlalchemy import ForeignKey, Index
+from sqlalchemy import ForeignKey
 
 class TeamMate(Base):
     __tablename__ = "teammate"
     __table_args__ = (
         Index("idx_teammate_user_id_team_id", "user_id", "team_id", unique=True),
+        # 按团队查成员时使用, (user_id, team_id) 的前导列是 user_id, 无法按 team_id 范围扫描
+        Index("idx_teammate_team_id_user_id", "team_id", "user_id"),
         {"comment": "用户团队关联表"},
     )
 
@@ -0,0 +1,120 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析，或与当前排序方式不一致"""
+
+
+@dataclass
+class CursorPage(Generic[T]):
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None  # 满足条件的总数, 没有请求时为 None
+    total_mode: Optional[str] = None  # total 的来源: exact / cached / estimated
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError("invalid cursor") from e
+    if not isinstance(payload, dict) or not isinstance(payload.get("v"), list):
+        raise InvalidCursorError("invalid cursor")
+    # 排序列都是整数/字符串; null、对象、数组等无法绑定为参数, 不能交给数据库
+    if not all(isinstance(v, (int, str)) and not isinstance(v, bool) for v in payload["v"]):
+        raise InvalidCursorError("invalid cursor")
+    return payload
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _after(columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    """
+    生成 "排在 values 之后" 的 keyset 条件:
+    (c1 > v1) OR (c1 = v1 AND c2 > v2) ...
+    展开成 OR 而不是行值比较, MySQL 才能走索引范围扫描
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        head = [columns[j] == values[j] for j in range(i)]
+        tail = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*head, tail))
+    return or_(*clauses)
+
+
+async def keyset_paginate(
+    session: AsyncSession,
+    statement,
+    columns: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    order_name: str = "id",
+    descending: bool = False,
+) -> CursorPage:
+    """
+    基于 keyset 的游标分页, 每一页的代价和第一页相同
+    Args:
+        statement: 不带 order_by / limit 的 select 语句
+        columns: 排序列, 最后一列必须唯一(通常是主键)用于打破平局
+        limit: 每页条数, 超过 MAX_PAGE_SIZE 会被截断
+        cursor: 上一次返回的 next_cursor / prev_cursor
+        order_name: 排序方式名称, 写入游标用于校验
+        descending: 是否倒序
+    Returns:
+        CursorPage: items 以及前后页游标
+    """
+    limit = clamp_page_size(limit)
+    backward = False
+    if cursor:
+        payload = decode_cursor(cursor)
+        if payload.get("o") != order_name or bool(payload.get("d")) != descending \
+                or len(payload["v"]) != len(columns):
+            raise InvalidCursorError("cursor does not match the requested ordering")
+        backward = bool(payload.get("b"))
+        # 向前翻页时把方向反过来查, 再把结果倒回来
+        statement = statement.where(_after(columns, payload["v"], descending != backward))
+
+    scan_desc = descending != backward
+    statement = statement.order_by(*[c.desc() if scan_desc else c.asc() for c in columns])
+    # 多取一条用来判断是否还有下一页, 避免 COUNT(*)
+    rows = list((await session.exec(statement.limit(limit + 1))).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    def make_cursor(row, is_backward: bool) -> str:
+        values = [getattr(row, c.key) for c in columns]
+        return encode_cursor({"o": order_name, "d": descending, "b": is_backward, "v": values})
+
+    page = CursorPage(items=rows)
+    if rows:
+        if backward:
+            page.prev_cursor = make_cursor(rows[0], True) if has_more else None
+            page.next_cursor = make_cursor(rows[-1], False)
+        else:
+            page.next_cursor = make_cursor(rows[-1], False) if has_more else None
+            page.prev_cursor = make_cursor(rows[0], True) if cursor else None
+    return page
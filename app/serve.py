@@ -0,0 +1,101 @@
+"""
+生产环境启动入口, 代替手工执行 uvicorn app.main:app
+
+    python -m app.serve --workers 4 --port 8000 --connection-budget 100
+
+- 默认按 CPU 核数启动 worker, 由 uvicorn 的多进程管理器负责拉起挂掉的 worker
+- kill -HUP <主进程> 平滑重启: 逐个启动新 worker, 新 worker 预热完成开始服务后才停掉旧的
+- 每个 worker 的连接池大小由数据库连接总预算推出, 通过 APP_DB_* 环境变量传给 worker
+- worker 在 lifespan 中完成预热(填充连接池、预编译语句)之后才开始 accept
+- 用户缓存在每个 worker 进程内, 写操作只失效本 worker 的缓存; 多个 worker 时默认把 TTL 缩短到
+  MULTI_WORKER_USER_CACHE_TTL 秒, 其他 worker 最多读到这么久之前的角色或已删除的用户
+"""
+import argparse
+import logging
+import os
+from typing import Optional, Sequence, Tuple
+
+import uvicorn
+
+from app.config import ENV_PREFIX, load_database_settings
+
+logger = logging.getLogger("app.serve")
+
+# 每个 worker 的连接份额中留给 max_overflow 的比例, 其余为常驻连接
+OVERFLOW_RATIO = 0.25
+# 多个 worker 时用户缓存的默认 TTL: 缓存不跨进程失效, 旧数据最多保留这么久
+MULTI_WORKER_USER_CACHE_TTL = 1.0
+
+
+def plan_pool(budget: int, workers: int) -> Tuple[int, int]:
+    """
+    把数据库连接总预算分给各个 worker
+    平滑重启时新旧 worker 会短暂共存, 多留出一个 worker 的份额
+    Returns:
+        (pool_size, max_overflow): 每个 worker 的连接池参数, 两者之和不超过份额
+    """
+    share = budget // (workers + 1)
+    if share < 1:
+        raise ValueError(f"connection budget {budget} is too small for {workers} workers")
+    max_overflow = int(share * OVERFLOW_RATIO)
+    return share - max_overflow, max_overflow
+
+
+def plan_user_cache_ttl(configured: float, workers: int, requested: Optional[float] = None) -> float:
+    """
+    每个 worker 的用户缓存 TTL; 显式指定时原样使用
+    多个 worker 时缩短到 MULTI_WORKER_USER_CACHE_TTL, 因为写操作不会失效其他 worker 的缓存
+    """
+    if requested is not None:
+        return requested
+    if workers > 1:
+        return min(configured, MULTI_WORKER_USER_CACHE_TTL)
+    return configured
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    settings = load_database_settings()
+    parser = argparse.ArgumentParser(description="启动多 worker 的 API 服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker 进程数, 默认等于 CPU 核数; 用户缓存在每个 worker 内, 写入不会失效"
+                             "其他 worker 的缓存, 多于 1 个时缓存 TTL 默认缩短, 见 --user-cache-ttl")
+    parser.add_argument("--user-cache-ttl", type=float, default=None,
+                        help="每个 worker 的用户缓存秒数, 0 表示关闭; 缓存不跨 worker 失效, 其他 worker 在这段时间内"
+                             "可能读到旧的角色或已删除的用户。默认: 单 worker 沿用配置, "
+                             f"多 worker 缩短到 {MULTI_WORKER_USER_CACHE_TTL:g} 秒")
+    parser.add_argument("--connection-budget", type=int, default=settings.connection_budget,
+                        help="所有 worker 合计可以占用的数据库连接数, 0 表示沿用 pool_size/max_overflow 配置")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="停止 worker 时等待进行中请求完成的秒数")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if args.connection_budget > 0:
+        pool_size, max_overflow = plan_pool(args.connection_budget, args.workers)
+        # worker 进程导入 app.database 时从环境变量读取
+        os.environ[ENV_PREFIX + "POOL_SIZE"] = str(pool_size)
+        os.environ[ENV_PREFIX + "MAX_OVERFLOW"] = str(max_overflow)
+    else:
+        pool_size, max_overflow = settings.pool_size, settings.max_overflow
+    user_cache_ttl = plan_user_cache_ttl(settings.user_cache_ttl, args.workers, args.user_cache_ttl)
+    os.environ[ENV_PREFIX + "USER_CACHE_TTL"] = str(user_cache_ttl)
+    logging.basicConfig(level=args.log_level.upper())
+    logger.info("starting %d workers, pool_size=%d max_overflow=%d user_cache_ttl=%gs per worker",
+                args.workers, pool_size, max_overflow, user_cache_ttl)
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        # 预热失败时 worker 直接退出, 不会带着冷的连接池接收流量
+        lifespan="on",
+    )
+
+
+if __name__ == "__main__":
+    main()
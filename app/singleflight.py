@@ -0,0 +1,51 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    合并同一个 key 的并发调用: 第一个调用者真正执行, 其余调用者等待并共享它的结果或异常
+    只在执行期间合并, 结果不做缓存
+    共享的结果会被多个请求同时使用, 应返回普通数据而不是绑定某个 session 的 ORM 对象
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0  # 真正执行的次数
+        self.shared = 0  # 搭便车的次数
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                # shield: 某个等待者被取消不影响其他等待者
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # 执行者被取消, 由当前调用者重新发起
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记已读取, 没有等待者时不打印 "never retrieved"
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.instrumentation import current_route
+
+logger = logging.getLogger("app.slow_query")
+
+# 环形缓冲区保留的慢查询条数
+SLOW_QUERY_BUFFER_SIZE = 500
+# 记录的参数 repr 最大长度
+MAX_PARAMETERS_LENGTH = 500
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+# IN (?, ?, ?) / VALUES (?, ?), (?, ?) 中的占位符个数不影响语句形态
+_PLACEHOLDER_LIST = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")*\s*\)")
+_REPEATED_GROUPS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _PLACEHOLDER_LIST.sub("(...)", statement)
+    shape = _REPEATED_GROUPS.sub("(...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class SlowQuery:
+    shape_id: str
+    statement: str
+    parameters: str
+    duration_ms: float
+    route: Optional[str]
+    at: float
+    explain: Optional[List[Any]] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class SlowQueryLog:
+    """
+    慢查询记录器: 超过阈值的 SQL 写日志并放入环形缓冲区
+    每种语句形态的前 N 次会在另一个连接上执行 EXPLAIN(SQLite 为 EXPLAIN QUERY PLAN)
+    EXPLAIN 在后台任务中执行, 不阻塞原请求
+    """
+
+    def __init__(self, maxlen: int = SLOW_QUERY_BUFFER_SIZE):
+        self.records: "deque[SlowQuery]" = deque(maxlen=maxlen)
+        self._explained: Dict[str, int] = {}
+        self._tasks = set()
+
+    def attach(self, engine: AsyncEngine, threshold_seconds: float, explain_limit: int = 3) -> None:
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+            if context is not None and context.execution_options.get("skip_slow_query_log"):
+                return
+            if elapsed >= threshold_seconds:
+                self.record(engine, statement, parameters, elapsed, executemany, explain_limit)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", before)
+        event.listen(engine.sync_engine, "after_cursor_execute", after)
+
+    def record(self, engine: AsyncEngine, statement: str, parameters, elapsed: float,
+               executemany: bool = False, explain_limit: int = 3) -> SlowQuery:
+        shape = statement_shape(statement)
+        shape_id = hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+        item = SlowQuery(
+            shape_id=shape_id,
+            statement=statement,
+            parameters=repr(parameters)[:MAX_PARAMETERS_LENGTH],
+            duration_ms=round(elapsed * 1000, 3),
+            route=current_route(),
+            at=time.time(),
+        )
+        self.records.append(item)
+        logger.warning("slow query %.1fms route=%s shape=%s: %s %s", item.duration_ms, item.route,
+                       shape_id, statement, item.parameters)
+
+        seen = self._explained.get(shape_id, 0)
+        if not executemany and seen < explain_limit and _explainable(statement):
+            self._explained[shape_id] = seen + 1
+            try:
+                task = asyncio.get_running_loop().create_task(self._explain(engine, item, parameters))
+            except RuntimeError:  # 不在事件循环中(例如同步脚本), 跳过 EXPLAIN
+                return item
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return item
+
+    async def _explain(self, engine: AsyncEngine, item: SlowQuery, parameters) -> None:
+        prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(
+                    prefix + item.statement, parameters,
+                    execution_options={"skip_slow_query_log": True},
+                )
+                item.explain = [list(row) for row in result.all()]
+        except Exception as e:
+            item.explain = [f"EXPLAIN failed: {e}"]
+
+    async def wait_explains(self) -> None:
+        """等待尚未完成的 EXPLAIN, 主要用于测试"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def recent(self, limit: int = 100) -> List[dict]:
+        return [item.to_dict() for item in list(self.records)[-limit:][::-1]]
+
+
+def _explainable(statement: str) -> bool:
+    return statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+slow_query_log = SlowQueryLog()
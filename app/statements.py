@@ -0,0 +1,79 @@
+"""
+热点 crud 语句注册表
+
+语句在导入时构建一次, 参数通过 bindparam 在执行时传入
+同一个语句对象的缓存键只生成一次(memoized), 每次调用省去了构建 select()/update()
+和遍历整棵语句树生成缓存键的开销, 直接命中引擎的编译缓存
+
+UPDATE/DELETE 关闭了 synchronize_session: ORM 同步 identity map 时取不到 bindparam 的实际值,
+由调用方用 sync_loaded_user 同步 session 中已加载的对象
+"""
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, literal, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlmodel import select
+
+from app.models import Team, TeamMate, User
+
+# 参数: user_id
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+# 参数: user_id, new_role
+UPDATE_USER_ROLE = (
+    update(User)
+    .where(User.id == bindparam("user_id"))
+    .values(role=bindparam("new_role"))
+    .execution_options(synchronize_session=False)
+)
+UPDATE_USER_ROLE_RETURNING = UPDATE_USER_ROLE.returning(User)
+
+# 参数: user_id
+DELETE_USER = (
+    delete(User)
+    .where(User.id == bindparam("user_id"))
+    .execution_options(synchronize_session=False)
+)
+
+# 参数: team_id; teammate 侧走 idx_teammate_team_id_user_id, 按索引顺序输出, 不需要额外排序
+TEAM_MEMBERS = (
+    select(User)
+    .join(TeamMate, TeamMate.user_id == User.id)
+    .where(TeamMate.team_id == bindparam("team_id"))
+    .order_by(TeamMate.user_id)
+)
+
+# 参数: user_id; teammate 侧走 idx_teammate_user_id_team_id 的前导列
+USER_TEAMS = (
+    select(Team)
+    .join(TeamMate, TeamMate.team_id == Team.id)
+    .where(TeamMate.user_id == bindparam("user_id"))
+    .order_by(TeamMate.team_id)
+)
+
+# 参数: team_id, user_id; 只读唯一索引 idx_teammate_user_id_team_id, 不回表
+TEAM_MEMBERSHIP = (
+    select(literal(1))
+    .where(TeamMate.user_id == bindparam("user_id"), TeamMate.team_id == bindparam("team_id"))
+    .limit(1)
+)
+
+
+def sync_loaded_user(session: AsyncSession, user_id: int, deleted: bool = False,
+                     **values) -> Optional[User]:
+    """
+    把 UPDATE/DELETE 的结果同步到 session 中已加载的 User 上, 不访问数据库
+    Returns:
+        Optional[User]: session 中已加载的对象, 没有加载过时为 None
+    """
+    user = session.identity_map.get(identity_key(User, user_id))
+    if user is None:
+        return None
+    if deleted:
+        session.expunge(user)
+        return None
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    return user
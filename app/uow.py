@@ -0,0 +1,68 @@
+import functools
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# session.info 中保存工作单元提交后回调的键; 存在即表示处于工作单元中
+UOW_KEY = "unit_of_work_after_commit"
+
+
+def in_unit_of_work(session: AsyncSession) -> bool:
+    return UOW_KEY in session.info
+
+
+async def commit_or_flush(session: AsyncSession) -> None:
+    """crud 函数的提交点: 在工作单元中只 flush(拿到自增 id 和 rowcount), 否则直接提交"""
+    if in_unit_of_work(session):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+async def rollback_unless_in_unit_of_work(session: AsyncSession) -> None:
+    # 工作单元中的回滚由工作单元统一处理
+    if not in_unit_of_work(session):
+        await session.rollback()
+
+
+async def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """事务提交后才执行的副作用(例如刷新缓存); 不在工作单元中时立即执行"""
+    if in_unit_of_work(session):
+        session.info[UOW_KEY].append(callback)
+    else:
+        await callback()
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+    """
+    事务范围: 其中的 crud 调用只 flush 不提交, 正常退出时统一提交一次, 异常时整体回滚
+    已经处于工作单元中时直接加入外层事务
+    """
+    if in_unit_of_work(session):
+        yield session
+        return
+    callbacks = session.info[UOW_KEY] = []
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        session.info.pop(UOW_KEY, None)
+    for callback in callbacks:
+        await callback()
+
+
+def transactional(function):
+    """
+    路由装饰器: 把关键字参数 session 放进工作单元, 整个请求只提交一次
+    在响应返回前提交, 提交失败会反映到响应上
+    """
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        async with unit_of_work(kwargs["session"]):
+            return await function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import configure_mappers
+
+from app import crud
+from app.database import EngineRouter
+from app.models import RoleEnum
+
+logger = logging.getLogger("app.warmup")
+
+
+async def fill_pool(engine: AsyncEngine, size: int) -> int:
+    """同时打开 size 个连接再全部归还, 让连接池预先建立好最少的连接"""
+    if size <= 0:
+        return 0
+    connections = []
+    try:
+        for _ in range(size):
+            conn = await engine.connect()
+            connections.append(conn)
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            await conn.close()
+    return len(connections)
+
+
+async def precompile_hot_statements(sessionmaker, include_writes: bool = True) -> None:
+    """
+    用不会命中任何数据的参数执行一遍热点 crud 语句, 让 SQL 编译结果进入引擎的编译缓存
+    写语句使用不存在的 id, 不会修改数据; 只读副本上不执行写语句
+    """
+    missing_id = -1
+    async with sessionmaker() as session:
+        await crud.get_user(session, missing_id)
+        await crud.list_users_page(session, limit=1)
+        await crud.list_team_members(session, missing_id)
+        await crud.list_user_teams(session, missing_id)
+        await crud.is_team_member(session, missing_id, missing_id)
+        if not include_writes:
+            return
+        await crud.update_user_role(session, missing_id, RoleEnum.USER)
+        await crud.delete_user(session, missing_id)
+
+
+async def warm_up(router: EngineRouter, pool_size: int) -> dict:
+    """
+    启动预热: 配置 mapper、填充连接池、预编译热点语句
+    Returns:
+        dict: 每一步的耗时(秒), 用于启动日志
+    """
+    timings = {}
+    start = time.perf_counter()
+    configure_mappers()
+    timings["configure_mappers"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engines: List[AsyncEngine] = [router.primary, *router.replicas]
+    await asyncio.gather(*[fill_pool(engine, pool_size) for engine in engines])
+    timings["fill_pool"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await precompile_hot_statements(router.primary_sessionmaker)
+    for maker in router.replica_sessionmakers:
+        await precompile_hot_statements(maker, include_writes=False)
+    timings["precompile"] = time.perf_counter() - start
+
+    logger.info("warm-up finished: %s", {k: round(v, 4) for k, v in timings.items()})
+    return timings
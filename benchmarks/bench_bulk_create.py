@@ -0,0 +1,69 @@
+"""
+对比循环调用 create_user 与 create_users 批量插入的耗时
+
+    python -m benchmarks.bench_bulk_create --rows 10000 --chunk-size 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud import create_user, create_users, BULK_INSERT_CHUNK_SIZE
+from app.models import Base, StatusEnum, RoleEnum
+
+
+async def make_engine(url: str):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+async def bench_loop(engine, rows: int) -> float:
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    start = time.perf_counter()
+    async with async_session() as session:
+        for i in range(rows):
+            await create_user(session, name=f"loop{i}")
+    return time.perf_counter() - start
+
+
+async def bench_bulk(engine, rows: int, chunk_size: int) -> float:
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    users = [(f"bulk{i}", StatusEnum.PENDING, RoleEnum.USER) for i in range(rows)]
+    start = time.perf_counter()
+    async with async_session() as session:
+        ids = await create_users(session, users, chunk_size)
+    assert len(ids) == rows
+    return time.perf_counter() - start
+
+
+async def main(url: str, rows: int, chunk_size: int):
+    engine = await make_engine(url)
+    loop_seconds = await bench_loop(engine, rows)
+    await engine.dispose()
+
+    engine = await make_engine(url)
+    bulk_seconds = await bench_bulk(engine, rows, chunk_size)
+    await engine.dispose()
+
+    print(f"rows={rows} chunk_size={chunk_size}")
+    print(f"create_user loop : {loop_seconds:8.3f}s  {rows / loop_seconds:10.0f} rows/s")
+    print(f"create_users bulk: {bulk_seconds:8.3f}s  {rows / bulk_seconds:10.0f} rows/s")
+    print(f"speedup          : {loop_seconds / bulk_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=BULK_INSERT_CHUNK_SIZE)
+    parser.add_argument("--url", default=None, help="默认使用临时 SQLite 文件")
+    args = parser.parse_args()
+    url = args.url or "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    asyncio.run(main(url, args.rows, args.chunk_size))
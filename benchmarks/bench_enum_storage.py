@@ -0,0 +1,123 @@
+"""
+RoleEnum 按字符串(String(20))和按编码(EnumCode, MySQL 为 TINYINT)存储的对比: 在 SQLite 临时文件中
+建两张结构相同、只有 role 列类型不同的用户表, 写入相同的 --rows 行数据, 用 dbstat 统计表和每个索引
+占用的页大小与实际数据量, 并对比读取 role 列(查表还原为字符串)的耗时
+
+    python -m benchmarks.bench_enum_storage --rows 1000000
+
+SQLite 的整数按值变长存储(0/1 不占数据字节), 字符串带长度头; MySQL 上 VARCHAR(20) 为 1 字节长度 + 字符,
+TINYINT 固定 1 字节, 最后一并按 InnoDB 的列宽估算每行与每个索引条目节省的字节数
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+import warnings
+from typing import Dict, Tuple
+
+import sqlalchemy as sa
+
+from app.models import RoleEnum, StatusEnum, role_type
+
+warnings.filterwarnings("ignore")
+
+TABLES = {
+    "user_role_string": sa.String(20),
+    "user_role_code": role_type,
+}
+
+
+def make_table(metadata: sa.MetaData, name: str, type_) -> sa.Table:
+    # 与 app.models.User 相同的列和筛选索引
+    return sa.Table(
+        name, metadata,
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("name", sa.String(20), nullable=False),
+        sa.Column("status", sa.SmallInteger),
+        sa.Column("role", type_),
+        sa.Index(f"{name}_status_role_id", "status", "role", "id"),
+        sa.Index(f"{name}_role_id", "role", "id"),
+        sa.Index(f"{name}_name_id", "name", "id"),
+    )
+
+
+def seed(engine: sa.Engine, tables: Dict[str, sa.Table], rows: int, chunk: int = 50000) -> None:
+    rng = random.Random(42)
+    roles = [RoleEnum.USER.value] * 90 + [RoleEnum.GUEST.value] * 9 + [RoleEnum.ADMIN.value]
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            batch = [
+                {
+                    "name": "".join(rng.choices(string.ascii_lowercase, k=8)),
+                    "status": rng.choice(list(StatusEnum)).value,
+                    "role": rng.choice(roles),
+                }
+                for _ in range(min(chunk, rows - start))
+            ]
+            for table in tables.values():
+                conn.execute(table.insert(), batch)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+def storage(engine: sa.Engine) -> Dict[str, Tuple[int, int]]:
+    """{表或索引名: (页大小合计, 数据字节合计)}"""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT name, SUM(pgsize), SUM(payload) FROM dbstat GROUP BY name").all()
+    return {name: (pages, payload) for name, pages, payload in rows}
+
+
+def read_roles(engine: sa.Engine, table: sa.Table, repeat: int) -> float:
+    statement = sa.select(table.c.id, table.c.role)
+    with engine.connect() as conn:
+        conn.execute(statement).all()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(statement).all()
+        return (time.perf_counter() - start) / repeat
+
+
+def main(rows: int, repeat: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench_enum_storage.db")
+    engine = sa.create_engine(f"sqlite:///{path}")
+    metadata = sa.MetaData()
+    tables = {name: make_table(metadata, name, type_) for name, type_ in TABLES.items()}
+    metadata.create_all(engine)
+    start = time.perf_counter()
+    seed(engine, tables, rows)
+    print(f"seeded {rows} rows into each table in {time.perf_counter() - start:.1f}s")
+
+    sizes = storage(engine)
+    string_table, code_table = TABLES
+    print(f"\n{'object':<22}{'string MB':>12}{'code MB':>10}{'saved':>8}{'string B/row':>14}{'code B/row':>12}")
+    for suffix in ("", "_status_role_id", "_role_id", "_name_id"):
+        (string_pages, string_payload) = sizes[string_table + suffix]
+        (code_pages, code_payload) = sizes[code_table + suffix]
+        label = suffix.lstrip("_") or "table"
+        print(f"{label:<22}{string_pages / 2 ** 20:>12.2f}{code_pages / 2 ** 20:>10.2f}"
+              f"{1 - code_pages / string_pages:>8.1%}"
+              f"{string_payload / rows:>14.1f}{code_payload / rows:>12.1f}")
+
+    string_seconds = read_roles(engine, tables[string_table], repeat)
+    code_seconds = read_roles(engine, tables[code_table], repeat)
+    print(f"\nread id, role for all rows: string {string_seconds * 1000:.1f} ms, "
+          f"code {code_seconds * 1000:.1f} ms ({code_seconds / string_seconds:.2f}x)")
+
+    # InnoDB: VARCHAR(20) utf8mb4 为 1 字节长度 + 字符, TINYINT 为 1 字节; 两个筛选索引的条目中各有一份 role
+    with engine.connect() as conn:
+        average = conn.execute(sa.select(sa.func.avg(sa.func.length(tables[string_table].c.role)))).scalar_one()
+    per_copy = average  # (1 + 字符数) - 1
+    print(f"\nMySQL estimate: role {1 + average:.1f} B -> 1 B, {per_copy:.1f} B saved per row in the clustered index "
+          f"and per entry in idx_user_status_role_id / idx_user_role_id, "
+          f"~{per_copy * 3 * rows / 2 ** 20:.1f} MB for {rows} rows")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5, help="读取耗时重复测量的次数")
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
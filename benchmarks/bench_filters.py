@@ -0,0 +1,122 @@
+"""
+用户筛选列表的索引效果: 在 SQLite 临时文件中造 --rows 行数据, 分别在没有/有筛选索引时
+执行 list_users_page 生成的查询, 打印 EXPLAIN QUERY PLAN 和每次查询的耗时
+
+    python -m benchmarks.bench_filters --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+import warnings
+from typing import List, Tuple
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud import list_users_page
+from app.models import Base, User, StatusEnum, RoleEnum
+
+warnings.filterwarnings("ignore")
+
+FILTER_INDEXES = [index for index in User.__table__.indexes if index.name.startswith("idx_user_")]
+
+CASES = [
+    ("status=ACTIVE", dict(status=StatusEnum.ACTIVE)),
+    ("status=ACTIVE role=ADMIN", dict(status=StatusEnum.ACTIVE, role=RoleEnum.ADMIN)),
+    ("role=GUEST", dict(role=RoleEnum.GUEST)),
+    ("name_prefix=ab", dict(name_prefix="ab")),
+    # 匹配行很少时, 没有索引要扫完整张表才能凑不满一页
+    ("name_prefix=abcd", dict(name_prefix="abcd")),
+    ("status=INACTIVE role=ADMIN prefix=q", dict(status=StatusEnum.INACTIVE, role=RoleEnum.ADMIN, name_prefix="q")),
+    ("name_prefix=ab order_by=name", dict(name_prefix="ab", order_by="name")),
+    ("role=ADMIN order_by=name desc", dict(role=RoleEnum.ADMIN, order_by="name", desc=True)),
+]
+
+
+def seed(path: str, rows: int, chunk: int = 50000) -> None:
+    rng = random.Random(42)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    roles = [RoleEnum.USER.value] * 90 + [RoleEnum.GUEST.value] * 9 + [RoleEnum.ADMIN.value]
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            conn.execute(insert(User), [
+                {
+                    "name": "".join(rng.choices(string.ascii_lowercase, k=8)),
+                    "status": rng.choice(list(StatusEnum)).value,
+                    "role": rng.choice(roles),
+                }
+                for _ in range(min(chunk, rows - start))
+            ])
+    engine.dispose()
+
+
+def set_indexes(path: str, enabled: bool) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for index in FILTER_INDEXES:
+            index.drop(conn, checkfirst=True)
+            if enabled:
+                index.create(conn)
+        conn.execute(text("ANALYZE"))
+    engine.dispose()
+
+
+async def run_cases(path: str, repeat: int) -> List[Tuple[str, float, List[str]]]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    captured = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, context, executemany:
+                 captured.append((statement, parameters)))
+    maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = []
+    try:
+        for name, kwargs in CASES:
+            async with maker() as session:
+                await list_users_page(session, limit=20, **kwargs)
+                statement, parameters = captured[-1]
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    await list_users_page(session, limit=20, **kwargs)
+                    session.expunge_all()
+                elapsed = (time.perf_counter() - start) / repeat
+            async with engine.connect() as conn:
+                plan = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+                results.append((name, elapsed, [row[-1] for row in plan.all()]))
+    finally:
+        await engine.dispose()
+    return results
+
+
+def main(rows: int, repeat: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench_filters.db")
+    start = time.perf_counter()
+    seed(path, rows)
+    print(f"seeded {rows} rows in {time.perf_counter() - start:.1f}s")
+    timings = {}
+    for enabled in (False, True):
+        set_indexes(path, enabled)
+        print(f"\n=== {'with' if enabled else 'without'} filter indexes ===")
+        for name, elapsed, plan in asyncio.run(run_cases(path, repeat)):
+            timings.setdefault(name, []).append(elapsed)
+            print(f"{name:<38}{elapsed * 1000:>10.2f} ms")
+            for line in plan:
+                print(f"    {line}")
+
+    print(f"\n{'case':<38}{'no index ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for name, (without, with_index) in timings.items():
+        print(f"{name:<38}{without * 1000:>12.2f}{with_index * 1000:>12.2f}{without / with_index:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20, help="每种查询重复执行的次数")
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
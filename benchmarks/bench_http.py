@@ -0,0 +1,210 @@
+"""
+进程内 HTTP 压测: 通过 ASGI 客户端直接驱动 app.main.app, 数据库使用 aiosqlite 临时文件
+
+对每个路由(create / get / list / update role / delete)并发发起请求, 统计
+吞吐、p50/p95/p99 延迟以及每个请求执行的 SQL 条数, 结果保存为 JSON 便于在提交之间对比
+
+    python -m benchmarks.bench_http --users 10000 --requests 2000 --concurrency 32 --output before.json
+    python -m benchmarks.bench_http --users 10000 --requests 2000 --concurrency 32 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import warnings
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import get_user_cache
+from app.crud import create_users
+from app.database import get_session, get_read_session
+from app.main import app
+from app.models import Base, StatusEnum, RoleEnum
+
+warnings.filterwarnings("ignore")
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    concurrency: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    statements_per_request: float
+
+
+@dataclass
+class SuiteResult:
+    commit: str
+    created_at: str
+    users: int
+    scenarios: List[ScenarioResult] = field(default_factory=list)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class StatementCounter:
+    """统计引擎执行的 SQL 条数, 场景之间串行执行, 总数除以请求数即为每请求的 SQL 条数"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+async def run_scenario(name: str, client: httpx.AsyncClient, counter: StatementCounter,
+                       make_request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+                       requests: int, concurrency: int) -> ScenarioResult:
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+                if response.status_code >= 400 or response.json().get("error_code"):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    statements_before = counter.count
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return ScenarioResult(
+        name=name,
+        requests=requests,
+        concurrency=concurrency,
+        errors=errors,
+        seconds=round(seconds, 4),
+        throughput=round(requests / seconds, 1),
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 0.95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 3),
+        statements_per_request=round((counter.count - statements_before) / requests, 2),
+    )
+
+
+async def run_suite(users: int, requests: int, concurrency: int, url: Optional[str] = None) -> SuiteResult:
+    url = url or "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_http.db")
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_session():
+        async with async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    await get_user_cache().clear()
+
+    # 造数据
+    async with async_session() as session:
+        ids = await create_users(
+            session, [(f"seed{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(users)]
+        )
+    rng = random.Random(42)
+    roles = [role.value for role in RoleEnum]
+    # 删除场景使用的 id 不与其他场景重复
+    delete_ids = ids[-min(requests, len(ids) // 2):]
+    live_ids = ids[:len(ids) - len(delete_ids)]
+
+    scenarios: Dict[str, Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]] = {
+        "create": lambda c, i: c.post("/users/", params={"name": f"bench{i}"}),
+        "get": lambda c, i: c.get(f"/users/{rng.choice(live_ids)}"),
+        "list": lambda c, i: c.get("/users/", params={"limit": 50}),
+        "update_role": lambda c, i: c.patch(f"/users/{rng.choice(live_ids)}/role",
+                                            params={"role": rng.choice(roles)}),
+        "delete": lambda c, i: c.delete(f"/users/{delete_ids[i % len(delete_ids)]}"),
+    }
+
+    counter = StatementCounter(engine)
+    result = SuiteResult(commit=git_commit(), created_at=time.strftime("%Y-%m-%dT%H:%M:%S"), users=users)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in scenarios.items():
+                count = min(requests, len(delete_ids)) if name == "delete" else requests
+                result.scenarios.append(
+                    await run_scenario(name, client, counter, make_request, count, concurrency)
+                )
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+        app.dependency_overrides.pop(get_read_session, None)
+        await engine.dispose()
+    return result
+
+
+def print_result(result: SuiteResult, baseline: Optional[dict] = None):
+    base = {s["name"]: s for s in baseline["scenarios"]} if baseline else {}
+    print(f"commit={result.commit} users={result.users}")
+    print(f"{'scenario':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'sql/req':>9}{'errors':>8}")
+    for s in result.scenarios:
+        line = (f"{s.name:<12}{s.throughput:>10.1f}{s.p50_ms:>10.2f}{s.p95_ms:>10.2f}"
+                f"{s.p99_ms:>10.2f}{s.statements_per_request:>9.2f}{s.errors:>8}")
+        if s.name in base:
+            old = base[s.name]
+            line += (f"   vs {baseline['commit']}: req/s {s.throughput / old['throughput'] - 1:+.1%}"
+                     f" p99 {s.p99_ms / old['p99_ms'] - 1:+.1%}"
+                     f" sql/req {s.statements_per_request - old['statements_per_request']:+.2f}")
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000, help="预先写入的用户数")
+    parser.add_argument("--requests", type=int, default=1000, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--url", default=None, help="数据库地址, 默认使用临时 SQLite 文件")
+    parser.add_argument("--output", default=None, help="结果保存为 JSON")
+    parser.add_argument("--compare", default=None, help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args()
+
+    suite = asyncio.run(run_suite(args.users, args.requests, args.concurrency, args.url))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_result(suite, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(asdict(suite), f, ensure_ascii=False, indent=2)
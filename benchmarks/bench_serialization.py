@@ -0,0 +1,62 @@
+"""
+对比列表响应的两条序列化路径(不含数据库):
+  slow: handle_return_or_raise 包装 APIResponse, FastAPI 再按 response_model 校验并 jsonable_encoder
+  fast: fast_api_response 直接把 ORM 对象编码为 JSON 字节
+
+    python -m benchmarks.bench_serialization --rows 1000 100000
+"""
+import argparse
+import asyncio
+import time
+import warnings
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+from app.api_response import APIResponse, handle_return_or_raise, fast_api_response
+from app.main import UserRead
+from app.models import User, RoleEnum, StatusEnum
+
+warnings.filterwarnings("ignore")
+
+
+def make_app(users: List[User]) -> FastAPI:
+    bench_app = FastAPI()
+
+    @bench_app.get("/slow", response_model=APIResponse[List[UserRead]])
+    @handle_return_or_raise
+    async def slow():
+        return users
+
+    @bench_app.get("/fast", response_model=APIResponse[List[UserRead]])
+    async def fast():
+        return fast_api_response(users)
+
+    return bench_app
+
+
+async def bench(rows: int, repeat: int):
+    users = [User(id=i, name=f"user{i}", status=StatusEnum.ACTIVE.value, role=RoleEnum.USER.value)
+             for i in range(rows)]
+    transport = httpx.ASGITransport(app=make_app(users))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for path in ("/slow", "/fast"):
+            await client.get(path)  # 预热
+            start = time.perf_counter()
+            for _ in range(repeat):
+                response = await client.get(path)
+            results[path] = (time.perf_counter() - start) / repeat
+            assert len(response.json()["data"]) == rows
+    slow, fast = results["/slow"], results["/fast"]
+    print(f"rows={rows:>7}  slow={slow * 1000:9.2f}ms  fast={fast * 1000:9.2f}ms  speedup={slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for rows in args.rows:
+        asyncio.run(bench(rows, args.repeat))
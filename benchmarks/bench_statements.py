@@ -0,0 +1,119 @@
+"""
+热点语句的 Python 侧开销: 每次调用现场构建语句 vs app.statements 中预构建的语句
+
+SQL 本身的耗时不计入: 同一条 SQL 直接用 sqlite3 游标执行并取回结果, 作为基线从总耗时中减去,
+剩下的是语句构建、缓存键生成、编译缓存查找以及 ORM 结果处理的开销
+
+    python -m benchmarks.bench_statements --calls 20000
+"""
+import argparse
+import time
+import warnings
+from typing import Callable
+
+from sqlalchemy import create_engine, delete, literal, update
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from app import statements
+from app.models import Base, Team, TeamMate, User, role_type
+
+warnings.filterwarnings("ignore")
+
+
+def timed(calls: int, fn: Callable[[int], object]) -> float:
+    """返回每次调用的平均耗时(微秒)"""
+    for i in range(min(calls, 200)):  # 预热, 填充编译缓存
+        fn(i)
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def compiled_sql(session: Session, statement) -> str:
+    return str(statement.compile(session.get_bind()))
+
+
+def main(calls: int, users: int) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(User(name=f"u{i}", status=1, role="user") for i in range(users))
+        session.add(Team(name="t"))
+        session.flush()
+        session.add_all(TeamMate(team_id=1, user_id=i + 1) for i in range(0, users, 100))
+        session.commit()
+
+    session = Session(engine)
+    raw = session.connection().connection.dbapi_connection.cursor()
+
+    def ids(i: int) -> int:
+        return i % users + 1
+
+    cases = {
+        "get_user": (
+            lambda i: session.execute(select(User).where(User.id == ids(i))).scalars().first(),
+            lambda i: session.execute(statements.USER_BY_ID, {"user_id": ids(i)}).scalars().first(),
+            select(User).where(User.id == 1),
+            lambda i: (ids(i),),
+        ),
+        "update_user_role": (
+            lambda i: session.execute(update(User).where(User.id == ids(i)).values(role="admin")),
+            lambda i: session.execute(statements.UPDATE_USER_ROLE, {"user_id": ids(i), "new_role": "admin"}),
+            update(User).where(User.id == 1).values(role="admin"),
+            lambda i: (role_type.process_bind_param("admin", None), ids(i)),
+        ),
+        "delete_user": (
+            # id 不存在, 不会真正删除数据
+            lambda i: session.execute(delete(User).where(User.id == -ids(i))),
+            lambda i: session.execute(statements.DELETE_USER, {"user_id": -ids(i)}),
+            delete(User).where(User.id == -1),
+            lambda i: (-ids(i),),
+        ),
+        "team_members": (
+            lambda i: session.execute(
+                select(User).join(TeamMate, TeamMate.user_id == User.id)
+                .where(TeamMate.team_id == 1).order_by(TeamMate.user_id)
+            ).scalars().all(),
+            lambda i: session.execute(statements.TEAM_MEMBERS, {"team_id": 1}).scalars().all(),
+            select(User).join(TeamMate, TeamMate.user_id == User.id)
+            .where(TeamMate.team_id == 1).order_by(TeamMate.user_id),
+            lambda i: (1,),
+        ),
+        "is_team_member": (
+            lambda i: session.execute(
+                select(literal(1)).where(TeamMate.user_id == ids(i), TeamMate.team_id == 1).limit(1)
+            ).first(),
+            lambda i: session.execute(statements.TEAM_MEMBERSHIP, {"team_id": 1, "user_id": ids(i)}).first(),
+            select(literal(1)).where(TeamMate.user_id == 1, TeamMate.team_id == 1).limit(1),
+            lambda i: (1, ids(i), 1, 1, 0),
+        ),
+    }
+
+    print(f"calls={calls} users={users}  (微秒/次, overhead = 总耗时 - 直接执行 SQL 的耗时)")
+    print(f"{'statement':<18}{'sql only':>10}{'inline':>10}{'prebuilt':>10}"
+          f"{'inline ovh':>12}{'prebuilt ovh':>14}{'saved':>8}")
+    for name, (inline, cached, shape, params) in cases.items():
+        sql = compiled_sql(session, shape)
+        baseline = timed(calls, lambda i: raw.execute(sql, params(i)).fetchall())
+        inline_us = timed(calls, inline)
+        session.expunge_all()
+        cached_us = timed(calls, cached)
+        session.expunge_all()
+        inline_overhead = inline_us - baseline
+        cached_overhead = cached_us - baseline
+        print(f"{name:<18}{baseline:>10.1f}{inline_us:>10.1f}{cached_us:>10.1f}"
+              f"{inline_overhead:>12.1f}{cached_overhead:>14.1f}"
+              f"{1 - cached_overhead / inline_overhead:>8.0%}")
+    session.rollback()
+    session.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000, help="每条语句的调用次数")
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.calls, args.users)
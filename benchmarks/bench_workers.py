@@ -0,0 +1,130 @@
+"""
+多 worker 吞吐扩展性: 用 app.serve 分别以 1..N 个 worker 启动服务, 压测同一个路由
+
+数据库使用 SQLite 临时文件(先建表造数据, 各 worker 共享); 压测客户端运行在独立的进程中,
+避免客户端本身成为瓶颈。客户端进程数应不小于服务端 worker 数
+
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --clients 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from typing import List, Tuple
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from app.models import Base, User, StatusEnum, RoleEnum
+
+warnings.filterwarnings("ignore")
+
+
+def seed(path: str, users: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"u{i}", "status": StatusEnum.ACTIVE.value, "role": RoleEnum.USER.value}
+            for i in range(users)
+        ])
+    engine.dispose()
+
+
+def start_server(workers: int, port: int, db_path: str) -> subprocess.Popen:
+    env = dict(os.environ, APP_DB_URL=f"sqlite+aiosqlite:///{db_path}", APP_DB_SLOW_QUERY_MS="0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--log-level", "warning"],
+        env=env,
+    )
+
+
+def wait_ready(base_url: str, workers: int, timeout: float = 60) -> None:
+    # 连续多次就绪才开始压测, 尽量让每个 worker 都完成预热
+    deadline = time.monotonic() + timeout
+    ok = 0
+    while time.monotonic() < deadline:
+        try:
+            ok = ok + 1 if httpx.get(base_url + "/internal/ready").status_code == 200 else 0
+        except httpx.HTTPError:
+            ok = 0
+        if ok >= workers * 5:
+            return
+        time.sleep(0.05)
+    raise TimeoutError("server did not become ready")
+
+
+async def _client(base_url: str, path: str, concurrency: int, duration: float) -> Tuple[int, int]:
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        async def worker():
+            nonlocal done, errors
+            while time.monotonic() < deadline:
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                done += 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return done, errors
+
+
+def run_client(args) -> Tuple[int, int]:
+    return asyncio.run(_client(*args))
+
+
+def run_load(base_url: str, path: str, clients: int, concurrency: int, duration: float) -> Tuple[float, int]:
+    with multiprocessing.Pool(clients) as pool:
+        start = time.perf_counter()
+        results: List[Tuple[int, int]] = pool.map(
+            run_client, [(base_url, path, concurrency, duration)] * clients
+        )
+        seconds = time.perf_counter() - start
+    return sum(r[0] for r in results) / seconds, sum(r[1] for r in results)
+
+
+def main(worker_counts: List[int], clients: int, concurrency: int, duration: float,
+         path: str, users: int, port: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench_workers.db")
+    seed(db_path, users)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"path={path} clients={clients}x{concurrency} duration={duration}s cpus={os.cpu_count()}")
+    print(f"{'workers':>8}{'req/s':>12}{'speedup':>10}{'errors':>8}")
+    baseline = None
+    for workers in worker_counts:
+        server = start_server(workers, port, db_path)
+        try:
+            wait_ready(base_url, workers)
+            throughput, errors = run_load(base_url, path, clients, concurrency, duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        baseline = baseline or throughput
+        print(f"{workers:>8}{throughput:>12.1f}{throughput / baseline:>10.2f}x{errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="压测客户端进程数")
+    parser.add_argument("--concurrency", type=int, default=16, help="每个客户端进程的并发数")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", default="/users/?limit=20")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    main(args.workers, args.clients, args.concurrency, args.duration, args.path, args.users, args.port)
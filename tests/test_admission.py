@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.admission import AdmissionLimiter, AdmissionControlMiddleware, BUSY_ERROR_CODE
+
+
+@pytest.mark.asyncio
+async def test_limiter_queue_full_and_timeout():
+    limiter = AdmissionLimiter(limit=1, max_queue=1, queue_timeout=0.05)
+    assert await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    # 队列已满, 立即拒绝
+    assert await limiter.acquire() is False
+    # 排队超时
+    assert await waiter is False
+    assert limiter.rejected == {"queue_full": 1, "timeout": 1}
+    assert limiter.queued == 0
+
+    limiter.release()
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_hands_slot_to_waiters_in_order():
+    limiter = AdmissionLimiter(limit=1, max_queue=10, queue_timeout=1)
+    assert await limiter.acquire()
+    order = []
+
+    async def request(i):
+        assert await limiter.acquire()
+        order.append(i)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    tasks = [asyncio.ensure_future(request(i)) for i in range(3)]
+    await asyncio.sleep(0)
+    # 被取消的等待者不占用名额
+    cancelled = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2]
+    assert limiter.active == 0 and limiter.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_with_retry_after_and_bypasses_test_route():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/users/")
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/test")
+    async def test_route():
+        return {"ok": True}
+
+    limiter = AdmissionLimiter(limit=1, max_queue=1, queue_timeout=5)
+    app.add_middleware(AdmissionControlMiddleware, limiter=limiter)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        running = [asyncio.ensure_future(client.get("/users/")) for _ in range(2)]
+        while limiter.queued < 1:
+            await asyncio.sleep(0.001)
+
+        busy = await client.get("/users/")
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == "5"
+        assert busy.json()["error_code"] == BUSY_ERROR_CODE
+        assert (await client.get("/test")).status_code == 200
+
+        release.set()
+        assert [r.status_code for r in await asyncio.gather(*running)] == [200, 200]
+    assert limiter.stats()["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_keeps_slot_handed_over_at_timeout(monkeypatch):
+    limiter = AdmissionLimiter(limit=1, max_queue=1, queue_timeout=0.05)
+    assert await limiter.acquire()
+
+    async def wait_for(future, timeout):
+        # 模拟 Python 3.12+: 名额转交与超时同时发生
+        limiter.release()
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr("app.admission.asyncio.wait_for", wait_for)
+    assert await limiter.acquire() is True
+    assert limiter.rejected["timeout"] == 0
+    assert limiter.active == 1 and limiter.queued == 0
+    limiter.release()
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_bypass_predicate():
+    app = FastAPI()
+
+    @app.post("/users/")
+    async def create():
+        return {"ok": True}
+
+    limiter = AdmissionLimiter(limit=1, max_queue=0, queue_timeout=1)
+    assert await limiter.acquire()
+    app.add_middleware(AdmissionControlMiddleware, limiter=limiter,
+                       bypass=lambda scope: scope["method"] == "POST")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+        # 名额已满, 但被 bypass 的请求不经过准入控制
+        assert (await client.post("/users/")).status_code == 200
+        assert (await client.get("/users/")).status_code == 503
+    assert limiter.active == 1
@@ -0,0 +1,26 @@
+import json
+
+from app.api_response import dumps_json, fast_api_response
+from app.models import User, RoleEnum
+
+
+def test_dumps_orm_objects_as_columns():
+    users = [User(id=1, name="张三", status=1, role=RoleEnum.ADMIN), User(id=2, name="b", status=0, role="user")]
+    assert json.loads(dumps_json(users)) == [
+        {"id": 1, "name": "张三", "status": 1, "role": "admin"},
+        {"id": 2, "name": "b", "status": 0, "role": "user"},
+    ]
+
+
+def test_fast_response_has_envelope_shape():
+    response = fast_api_response([User(id=1, name="a", status=0, role="user")], next_cursor="abc")
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {
+        "error_code": 0,
+        "error_message": "",
+        "data": [{"id": 1, "name": "a", "status": 0, "role": "user"}],
+        "next_cursor": "abc",
+        "prev_cursor": None,
+        "total": None,
+        "total_mode": None,
+    }
@@ -0,0 +1,122 @@
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app.backfill import CHECKPOINT_TABLE, backfill, copy_swap_column, load_checkpoint, update_in_chunks
+
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE item (id INTEGER PRIMARY KEY, code VARCHAR(8), doubled INTEGER)"))
+        # 主键不连续, 分块按实际的主键而不是按数值范围
+        conn.execute(sa.text("INSERT INTO item (id, code) VALUES (:id, :code)"),
+                     [{"id": i * 3, "code": str(i)} for i in range(1, 101)])
+    with engine.connect() as conn:
+        yield conn
+    engine.dispose()
+
+
+def test_update_in_chunks_throttles_and_reports_progress(connection):
+    sleeps, reports = [], []
+    rows = update_in_chunks(connection, "item", "doubled = CAST(code AS INTEGER) * 2",
+                            chunk_size=30, throttle=0.5, progress=reports.append, sleep=sleeps.append)
+
+    assert rows == 100
+    assert [r.rows for r in reports] == [30, 60, 90, 100]
+    assert reports[-1].fraction == 1.0 and reports[-1].last_key == 300
+    # 最后一块之后不再暂停
+    assert sleeps == [0.5] * 3
+    assert connection.execute(sa.text("SELECT COUNT(*) FROM item WHERE doubled = CAST(code AS INTEGER) * 2")).scalar() == 100
+    # 完成后删除检查点
+    assert load_checkpoint(connection, "item") is None
+
+
+def test_backfill_resumes_from_checkpoint(connection):
+    calls = []
+
+    def failing(conn, lo, hi):
+        calls.append((lo, hi))
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")
+        return conn.execute(sa.text("UPDATE item SET doubled = id WHERE id BETWEEN :lo AND :hi"),
+                            {"lo": lo, "hi": hi}).rowcount
+
+    with pytest.raises(RuntimeError):
+        backfill(connection, "item", failing, name="doubled", chunk_size=25, progress=None)
+    connection.rollback()
+    assert load_checkpoint(connection, "doubled") == {"last_key": 150, "rows_done": 50, "chunks_done": 2}
+
+    resumed = []
+
+    def work(conn, lo, hi):
+        resumed.append((lo, hi))
+        return conn.execute(sa.text("UPDATE item SET doubled = id WHERE id BETWEEN :lo AND :hi"),
+                            {"lo": lo, "hi": hi}).rowcount
+
+    assert backfill(connection, "item", work, name="doubled", chunk_size=25, progress=None) == 100
+    assert resumed[0] == (153, 225)
+    assert len(resumed) == 2
+    assert connection.execute(sa.text("SELECT COUNT(*) FROM item WHERE doubled = id")).scalar() == 100
+
+
+def test_copy_swap_column(connection):
+    context = MigrationContext.configure(connection)
+    # 与 run_migrations 执行单个 revision 时一样开启事务
+    with context.begin_transaction(_per_migration=True):
+        rows = copy_swap_column(Operations(context), "item", "code", sa.Column("code", sa.Integer, nullable=False),
+                                "CAST(code AS INTEGER)", chunk_size=40, progress=None)
+
+    assert rows == 100
+    columns = {c["name"]: c for c in sa.inspect(connection).get_columns("item")}
+    assert "code__new" not in columns
+    assert isinstance(columns["code"]["type"], sa.Integer) and not columns["code"]["nullable"]
+    assert connection.execute(sa.text("SELECT SUM(code) FROM item")).scalar() == sum(range(1, 101))
+    assert sa.inspect(connection).has_table(CHECKPOINT_TABLE)
+
+
+def _copy_swap_code(connection, **kwargs):
+    context = MigrationContext.configure(connection)
+    with context.begin_transaction(_per_migration=True):
+        return copy_swap_column(Operations(context), "item", "code", sa.Column("code", sa.Integer, nullable=False),
+                                "CAST(code AS INTEGER)", chunk_size=40, **kwargs)
+
+
+def test_copy_swap_column_resumes_after_interruption(connection):
+    # 上一次执行在回填到一半时中断: 临时列已经存在, 前 80 行已写好
+    connection.execute(sa.text("ALTER TABLE item ADD COLUMN code__new INTEGER"))
+    connection.execute(sa.text("UPDATE item SET code__new = CAST(code AS INTEGER) WHERE id <= 240"))
+    connection.commit()
+
+    # 不再新增临时列, 已写好的行不再更新
+    assert _copy_swap_code(connection, progress=None) == 20
+    assert connection.execute(sa.text("SELECT SUM(code) FROM item")).scalar() == sum(range(1, 101))
+
+
+def test_copy_swap_column_catches_up_concurrent_writes(connection):
+    def write(progress):
+        # 回填期间: 修改已处理过的行, 新增一行
+        if progress.name == "item.code" and progress.chunks == 1:
+            connection.execute(sa.text("UPDATE item SET code = '1000' WHERE id = 3"))
+            connection.execute(sa.text("INSERT INTO item (id, code) VALUES (301, '7')"))
+
+    _copy_swap_code(connection, progress=write)
+    codes = dict(connection.execute(sa.text("SELECT id, code FROM item WHERE id IN (3, 301)")).all())
+    assert codes == {3: 1000, 301: 7}
+
+
+def test_copy_swap_column_rebuilds_indexes_before_swap(connection):
+    connection.execute(sa.text("CREATE INDEX idx_item_code_id ON item (code, id)"))
+    connection.commit()
+    seen = []
+
+    def check(progress):
+        # 回填期间旧索引仍然可用
+        seen.append({index["name"] for index in sa.inspect(connection).get_indexes("item")})
+
+    _copy_swap_code(connection, progress=check, indexes={"idx_item_code_id": ["code", "id"]})
+    assert all("idx_item_code_id" in names for names in seen)
+    indexes = sa.inspect(connection).get_indexes("item")
+    assert [(index["name"], index["column_names"]) for index in indexes] == [("idx_item_code_id", ["code", "id"])]
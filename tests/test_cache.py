@@ -0,0 +1,34 @@
+import pytest
+
+from app.cache import LRUTTLCache
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    cache = LRUTTLCache(maxsize=2, ttl=60)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # a 变为最近使用
+    await cache.set("c", 3)  # 淘汰最久未使用的 b
+    assert await cache.get("b") is None
+    assert await cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 2 and cache.stats.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiration():
+    cache = LRUTTLCache(maxsize=10, ttl=-1)  # 写入即过期
+    await cache.set("a", 1)
+    assert await cache.get("a") is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_counts_invalidation():
+    cache = LRUTTLCache()
+    await cache.set("a", 1)
+    await cache.delete("a")
+    await cache.delete("missing")
+    assert cache.stats.invalidations == 1
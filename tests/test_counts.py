@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import counts
+from app.counts import CountMode, CountProvider
+from app.crud import create_user, create_users, delete_user, list_users_page
+from app.models import Base, RoleEnum, StatusEnum, User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'counts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cached_count_ttl_and_invalidation(session, monkeypatch):
+    clock = FakeClock()
+    provider = CountProvider(ttl=10, clock=clock)
+    monkeypatch.setattr(counts, "count_provider", provider)
+    await create_users(session, [(f"c{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(3)])
+
+    assert await provider.count(session, User) == (3, CountMode.CACHED)
+    assert await provider.count(session, User) == (3, CountMode.CACHED)
+    assert provider.exact_queries == 1
+
+    # 新增和删除后整表失效
+    user = await create_user(session, "c3")
+    assert await provider.count(session, User) == (4, CountMode.CACHED)
+    await delete_user(session, user.id)
+    assert await provider.count(session, User) == (3, CountMode.CACHED)
+    assert provider.exact_queries == 3
+
+    # 绕过 crud 的写入在 ttl 过期后才可见
+    await session.exec(text("DELETE FROM user WHERE name = 'c0'"))
+    await session.commit()
+    assert (await provider.count(session, User))[0] == 3
+    clock.now = 11
+    assert (await provider.count(session, User))[0] == 2
+
+    assert await provider.count(session, User, mode=CountMode.EXACT) == (2, CountMode.EXACT)
+
+
+@pytest.mark.asyncio
+async def test_cached_count_is_bounded(session):
+    clock = FakeClock()
+    provider = CountProvider(ttl=10, clock=clock, max_entries=2)
+    await create_users(session, [(f"b{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(3)])
+
+    def prefix(p):
+        return (User.name.like(f"{p}%"),)
+
+    await provider.count(session, User, prefix("a"))
+    await provider.count(session, User, prefix("b"))
+    # 命中后 a 成为最近使用的, 超出上限时淘汰 b
+    await provider.count(session, User, prefix("a"))
+    await provider.count(session, User, prefix("c"))
+    cache = provider._cache[User.__tablename__]
+    assert len(cache) == 2
+    assert provider.exact_queries == 3
+    await provider.count(session, User, prefix("a"))
+    assert provider.exact_queries == 3
+
+    # 超出上限时先清理过期的 a、c, 仍然超出才按最久未使用淘汰
+    clock.now = 11
+    await provider.count(session, User, prefix("d"))
+    clock.now = 15
+    await provider.count(session, User, prefix("e"))
+    await provider.count(session, User, prefix("f"))
+    assert len(cache) == 2
+    assert provider.exact_queries == 6
+    await provider.count(session, User, prefix("e"))
+    assert provider.exact_queries == 6
+
+
+@pytest.mark.asyncio
+async def test_estimated_count_uses_table_statistics(session, monkeypatch):
+    provider = CountProvider()
+    monkeypatch.setattr(counts, "count_provider", provider)
+    await create_users(session, [(f"e{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(5)])
+
+    # 还没有 ANALYZE: 退回缓存的精确值
+    assert await provider.count(session, User, mode=CountMode.ESTIMATED) == (5, CountMode.CACHED)
+
+    await session.exec(text("ANALYZE"))
+    await session.commit()
+    await create_users(session, [("e5", StatusEnum.ACTIVE, RoleEnum.USER)])
+    # 统计信息是 ANALYZE 时的行数, 不扫描数据
+    assert await provider.count(session, User, mode=CountMode.ESTIMATED) == (5, CountMode.ESTIMATED)
+    # 带筛选条件时统计信息不适用
+    assert await provider.count(session, User, [User.name == "e1"], CountMode.ESTIMATED) \
+        == (1, CountMode.CACHED)
+
+
+@pytest.mark.asyncio
+async def test_page_reports_total_mode(session, monkeypatch):
+    monkeypatch.setattr(counts, "count_provider", CountProvider())
+    await create_users(session, [
+        ("p0", StatusEnum.ACTIVE, RoleEnum.ADMIN),
+        ("p1", StatusEnum.ACTIVE, RoleEnum.USER),
+        ("p2", StatusEnum.PENDING, RoleEnum.ADMIN),
+    ])
+    page = await list_users_page(session, limit=1)
+    assert page.total is None and page.total_mode is None
+
+    page = await list_users_page(session, limit=1, role=RoleEnum.ADMIN, count=CountMode.EXACT)
+    assert (page.total, page.total_mode) == (2, "exact")
+    page = await list_users_page(session, limit=1, status=StatusEnum.ACTIVE, count=CountMode.ESTIMATED)
+    assert (page.total, page.total_mode) == (2, "cached")
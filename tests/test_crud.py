@@ -1,12 +1,22 @@
+import asyncio
+
 import pytest
 import pytest_asyncio
+from sqlalchemy import text
 from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.models import User, RoleEnum, StatusEnum
-from app.crud import create_user, get_user, list_users, update_user_role, delete_user
+from app.models import Base, User, Team, RoleEnum, StatusEnum, role_type
+from app.crud import create_user, create_users, stream_users, get_user, list_users, list_users_page, update_user_role, delete_user
+from app.crud import (
+    create_team, list_team_members, list_user_teams, is_team_member, add_team_members, remove_team_members
+)
+from app.pagination import InvalidCursorError, encode_cursor
+from app.cache import get_user_cache
+from app.loader import LoaderRegistry
+from app.uow import unit_of_work
 
 # 使用 SQLite 内存数据库进行测试
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -21,7 +31,7 @@ async def engine(event_loop):
         future=True
     )
     async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(Base.metadata.create_all)
     yield engine
     await engine.dispose()
 
@@ -87,3 +97,278 @@ async def test_delete_user(user_zhang: User, session: AsyncSession):
     deleted = await delete_user(session, user_zhang.id)
     assert deleted
     assert await get_user(session, user_zhang.id) is None
+
+
+@pytest.mark.asyncio
+async def test_list_users_page(session: AsyncSession):
+    # 游标分页: 向后翻完所有页, 再向前翻回第一页
+    for i in range(5):
+        await create_user(session, name=f"page{i}")
+    all_ids = [u.id for u in await list_users(session)]
+
+    pages, cursor = [], None
+    while True:
+        page = await list_users_page(session, limit=2, cursor=cursor)
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [u.id for p in pages for u in p.items] == sorted(all_ids)
+    assert pages[0].prev_cursor is None
+
+    back = await list_users_page(session, limit=2, cursor=pages[1].prev_cursor)
+    assert [u.id for u in back.items] == [u.id for u in pages[0].items]
+    assert back.prev_cursor is None
+
+    desc_page = await list_users_page(session, limit=2, desc=True)
+    assert [u.id for u in desc_page.items] == sorted(all_ids, reverse=True)[:2]
+    with pytest.raises(InvalidCursorError):
+        await list_users_page(session, limit=2, cursor=desc_page.next_cursor)
+    # 伪造的游标值不是标量
+    for values in ([None], [{"x": 1}], [[1]], [True]):
+        with pytest.raises(InvalidCursorError):
+            await list_users_page(session, limit=2, cursor=encode_cursor({"o": "id", "d": False, "v": values}))
+
+
+@pytest.mark.asyncio
+async def test_list_users_page_filters(session: AsyncSession):
+    # 白名单筛选 + 按名称排序; 前缀中的 _ 按字面匹配
+    await create_users(session, [
+        ("flt_b", StatusEnum.ACTIVE, RoleEnum.ADMIN),
+        ("flt_a", StatusEnum.ACTIVE, RoleEnum.USER),
+        ("flt_c", StatusEnum.INACTIVE, RoleEnum.ADMIN),
+        ("fltx", StatusEnum.ACTIVE, RoleEnum.ADMIN),
+    ])
+    page = await list_users_page(session, limit=10, name_prefix="flt_", order_by="name")
+    assert [u.name for u in page.items] == ["flt_a", "flt_b", "flt_c"]
+
+    page = await list_users_page(session, limit=10, name_prefix="flt", status=StatusEnum.ACTIVE,
+                                 role=RoleEnum.ADMIN, order_by="name", desc=True)
+    assert [u.name for u in page.items] == ["fltx", "flt_b"]
+
+    first = await list_users_page(session, limit=1, name_prefix="flt_", order_by="name")
+    second = await list_users_page(session, limit=1, name_prefix="flt_", order_by="name",
+                                   cursor=first.next_cursor)
+    assert [u.name for u in second.items] == ["flt_b"]
+    with pytest.raises(ValueError):
+        await list_users_page(session, order_by="status")
+
+
+def test_name_prefix_clause():
+    from sqlalchemy.dialects import mysql
+    from app.crud import _name_prefix_clause
+
+    clause = _name_prefix_clause("mysql", "a%_b")
+    compiled = clause.compile(dialect=mysql.dialect())
+    assert "LIKE" in str(compiled)
+    assert list(compiled.params.values()) == ["a\\%\\_b%"]
+    assert "<" in str(_name_prefix_clause("sqlite", "ab"))
+
+
+@pytest.mark.asyncio
+async def test_create_users(session: AsyncSession):
+    # 批量创建: 分块插入, 返回的 id 与输入顺序对应
+    users = [(f"bulk{i}", StatusEnum.ACTIVE, RoleEnum.GUEST) for i in range(7)]
+    ids = await create_users(session, users, chunk_size=3)
+    assert len(ids) == 7 and ids == sorted(ids)
+    for (name, _, _), user_id in zip(users, ids):
+        fetched = await get_user(session, user_id)
+        assert fetched.name == name
+        assert fetched.role == RoleEnum.GUEST
+    assert await create_users(session, []) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_users(session: AsyncSession):
+    # 流式读取: 按批返回, 合起来等于全部用户
+    await create_users(session, [(f"stream{i}", StatusEnum.PENDING, RoleEnum.USER) for i in range(5)])
+    batches = [rows async for rows in stream_users(session, batch_size=2)]
+    assert all(len(rows) <= 2 for rows in batches)
+    streamed_ids = [row.id for rows in batches for row in rows]
+    assert streamed_ids == sorted(u.id for u in await list_users(session))
+
+
+@pytest.mark.asyncio
+async def test_update_delete_missing_user(session: AsyncSession):
+    # 不存在的用户: 单条语句, 由 rowcount / RETURNING 判断
+    assert await update_user_role(session, 10 ** 9, RoleEnum.ADMIN) is None
+    assert await delete_user(session, 10 ** 9) is False
+
+
+@pytest.mark.asyncio
+async def test_hot_statements_reuse_compiled_cache(session: AsyncSession):
+    # 预构建语句: 不同参数共用一条编译缓存; session 中已加载的对象同步更新/移除
+    ids = await create_users(session, [(f"stmt{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(3)])
+    users = [await session.get(User, user_id) for user_id in ids]
+    await update_user_role(session, ids[0], RoleEnum.ADMIN)
+    cache = session.bind.sync_engine._compiled_cache
+    entries = len(cache)
+    await update_user_role(session, ids[1], RoleEnum.ADMIN)
+    await update_user_role(session, ids[2], RoleEnum.GUEST)
+    assert len(cache) == entries
+    assert [user.role for user in users] == [RoleEnum.ADMIN, RoleEnum.ADMIN, RoleEnum.GUEST]
+    assert await delete_user(session, ids[0])
+    assert users[0] not in session
+
+
+@pytest.mark.asyncio
+async def test_get_user_cache(user_zhang: User, session: AsyncSession):
+    # 读穿缓存: 创建后直接命中, 更新后缓存同步刷新
+    stats = get_user_cache().stats
+    hits = stats.hits
+    fetched = await get_user(session, user_zhang.id)
+    assert fetched.name == user_zhang.name
+    assert stats.hits == hits + 1
+
+    await update_user_role(session, user_zhang.id, RoleEnum.GUEST)
+    session.expunge_all()
+    assert (await get_user(session, user_zhang.id)).role == RoleEnum.GUEST
+
+
+@pytest.mark.asyncio
+async def test_loader_batches_point_lookups(session: AsyncSession):
+    # 同一轮事件循环中的 load 合并为 WHERE id IN (...), 超过 chunk_size 时拆分
+    ids = await create_users(session, [(f"loader{i}", StatusEnum.PENDING, RoleEnum.USER) for i in range(5)])
+    team = Team(name="loader team")
+    session.add(team)
+    await session.commit()
+
+    loaders = LoaderRegistry(session, chunk_size=3)
+    user_loader = loaders.for_model(User)
+    users = await asyncio.gather(*[user_loader.load(i) for i in ids + [10 ** 9]])
+    assert [u.id for u in users[:-1]] == ids
+    assert users[-1] is None
+    assert user_loader.queries == 2
+
+    # 请求内已加载的 key 不会重复查询
+    assert (await user_loader.load(ids[0])).id == ids[0]
+    assert user_loader.queries == 2
+
+    teams = await loaders.for_model(Team).load_many([team.id])
+    assert teams[0].name == "loader team"
+
+
+@pytest.mark.asyncio
+async def test_team_members(session: AsyncSession):
+    # 批量加入(重复的被忽略)、查询成员、查询用户所在团队、批量移除
+    team = await create_team(session, "members")
+    other = await create_team(session, "other")
+    ids = await create_users(session, [(f"member{i}", StatusEnum.ACTIVE, RoleEnum.USER) for i in range(4)])
+
+    assert await add_team_members(session, team.id, ids + ids[:2], chunk_size=3) == 4
+    assert await add_team_members(session, team.id, ids[:2]) == 0
+    assert await add_team_members(session, other.id, ids[:1]) == 1
+
+    assert [u.id for u in await list_team_members(session, team.id)] == ids
+    assert [t.id for t in await list_user_teams(session, ids[0])] == [team.id, other.id]
+    assert await is_team_member(session, team.id, ids[3])
+
+    # 只忽略唯一索引冲突, 外键等其他错误不会被 INSERT IGNORE 吞掉
+    from sqlalchemy.dialects import mysql
+    from app.crud import _insert_members_ignoring_duplicates
+    mysql_sql = str(_insert_members_ignoring_duplicates("mysql").values(user_id=1, team_id=1)
+                    .compile(dialect=mysql.dialect()))
+    assert "IGNORE" not in mysql_sql and "ON DUPLICATE KEY UPDATE team_id" in mysql_sql
+    assert "ON CONFLICT (user_id, team_id) DO NOTHING" in str(
+        _insert_members_ignoring_duplicates("sqlite").values(user_id=1, team_id=1).compile(dialect=session.bind.dialect))
+
+    assert await remove_team_members(session, team.id, ids[2:] + [10 ** 9]) == 2
+    assert not await is_team_member(session, team.id, ids[3])
+    assert [u.id for u in await list_team_members(session, team.id)] == ids[:2]
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_commits_once(session: AsyncSession):
+    # 工作单元中 crud 只 flush, 退出时统一提交; 异常时整体回滚, 缓存也不会被写入
+    commits = 0
+    original_commit = session.commit
+
+    async def counting_commit():
+        nonlocal commits
+        commits += 1
+        await original_commit()
+
+    session.commit = counting_commit
+    try:
+        async with unit_of_work(session):
+            team = await create_team(session, "uow")
+            user = await create_user(session, name="uow member")
+            await add_team_members(session, team.id, [user.id])
+        assert commits == 1
+        assert await is_team_member(session, team.id, user.id)
+
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(session):
+                doomed = await create_user(session, name="uow rollback")
+                doomed_id = doomed.id
+                raise RuntimeError("boom")
+        assert commits == 1
+        assert await get_user_cache().get(f"user:{doomed_id}") is None
+        assert await get_user(session, doomed_id) is None
+    finally:
+        session.commit = original_commit
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_reads_own_writes(session: AsyncSession):
+    # 工作单元中缓存写入推迟到提交后, 读取要绕过缓存, 且不能用旧快照覆盖已更新的对象
+    user = await create_user(session, name="uow reader", role=RoleEnum.USER)
+    await get_user(session, user.id)
+    async with unit_of_work(session):
+        updated = await update_user_role(session, user.id, RoleEnum.ADMIN)
+        fetched = await get_user(session, user.id)
+        assert fetched.role == RoleEnum.ADMIN
+        assert updated.role == RoleEnum.ADMIN
+    assert (await get_user_cache().get(f"user:{user.id}"))["role"] == RoleEnum.ADMIN
+
+
+@pytest.mark.asyncio
+async def test_role_stored_as_code(session: AsyncSession):
+    # role 在库中是编码, 读出、筛选和更新都按枚举的值
+    ids = await create_users(session, [("code0", StatusEnum.ACTIVE, RoleEnum.GUEST)])
+    await update_user_role(session, ids[0], "admin")
+    raw = await session.exec(text("SELECT role FROM user WHERE id = :id"), params={"id": ids[0]})
+    assert raw.scalar_one() == role_type.process_bind_param(RoleEnum.ADMIN, None) == 1
+    page = await list_users_page(session, limit=50, role=RoleEnum.ADMIN)
+    assert ids[0] in [user.id for user in page.items]
+    assert all(type(user.role) is str and user.role == "admin" for user in page.items)
+    assert User.__table__.c.role.comment == "用户角色 0: USER(user) 1: ADMIN(admin) 2: GUEST(guest)"
+    with pytest.raises(ValueError):
+        role_type.process_bind_param("owner", None)
+
+
+@pytest.mark.asyncio
+async def test_user_cache_fill_racing_delete(tmp_path, monkeypatch):
+    # 读取方 SELECT 返回后暂停, 删除提交并失效缓存, 读取方恢复后不能把旧快照写回缓存
+    import app.cache as cache
+    monkeypatch.setattr(cache, "user_cache", cache.LRUTTLCache())
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'race.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with maker() as writer, maker() as reader:
+            user = await create_user(writer, name="race")
+            await cache.user_cache.delete(f"user:{user.id}")
+            selected, resume = asyncio.Event(), asyncio.Event()
+            exec_ = reader.exec
+
+            async def paused_exec(*args, **kwargs):
+                result = await exec_(*args, **kwargs)
+                selected.set()
+                await resume.wait()
+                return result
+
+            monkeypatch.setattr(reader, "exec", paused_exec)
+            read = asyncio.ensure_future(get_user(reader, user.id))
+            await selected.wait()
+            assert await delete_user(writer, user.id)
+            resume.set()
+            assert (await read).name == "race"
+
+            assert await cache.user_cache.get(f"user:{user.id}") is None
+            monkeypatch.setattr(reader, "exec", exec_)
+            reader.expunge_all()
+            assert await get_user(reader, user.id) is None
+    finally:
+        await engine.dispose()
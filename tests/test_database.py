@@ -0,0 +1,160 @@
+import pytest
+from sqlalchemy import exc, text
+
+from app.config import load_database_settings
+from app.database import create_engine_from_settings, pool_status, InstrumentedQueuePool
+
+
+def test_settings_env_overrides_file(tmp_path, monkeypatch):
+    config_file = tmp_path / "app.ini"
+    config_file.write_text("[database]\nurl = sqlite+aiosqlite:///x.db\npool_size = 7\necho = true\n")
+    monkeypatch.setenv("APP_DB_POOL_SIZE", "3")
+    monkeypatch.setenv("APP_DB_POOL_PRE_PING", "false")
+    settings = load_database_settings(str(config_file))
+    assert settings.url == "sqlite+aiosqlite:///x.db"
+    assert settings.pool_size == 3
+    assert settings.echo is True
+    assert settings.pool_pre_ping is False
+    assert settings.max_overflow == 10
+
+
+@pytest.mark.asyncio
+async def test_pool_status(tmp_path, monkeypatch):
+    monkeypatch.setenv("APP_DB_URL", f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}")
+    monkeypatch.setenv("APP_DB_POOL_SIZE", "2")
+    monkeypatch.setenv("APP_DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("APP_DB_POOL_TIMEOUT", "0.05")
+    engine = create_engine_from_settings(load_database_settings())
+    assert isinstance(engine.sync_engine.pool, InstrumentedQueuePool)
+    try:
+        async with engine.connect() as c1, engine.connect() as c2:
+            await c1.execute(text("SELECT 1"))
+            status = pool_status(engine)
+            assert status["checked_out"] == 2
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect() as c3:
+                    await c3.execute(text("SELECT 1"))
+        status = pool_status(engine)
+        assert status["timeouts"] == 1
+        assert status["checkout_wait_seconds"]["count"] == 3
+    finally:
+        await engine.dispose()
+
+
+async def _make_router(tmp_path, strategy="round_robin"):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database import EngineRouter
+    from app.models import Base
+
+    engines = [create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+               for name in ("primary", "replica1", "replica2")]
+    for e in engines:
+        async with e.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    return EngineRouter(engines[0], engines[1:], strategy)
+
+
+@pytest.mark.asyncio
+async def test_router_round_robin_and_sticky(tmp_path):
+    router = await _make_router(tmp_path)
+    try:
+        picked = [router.read_sessionmaker() for _ in range(4)]
+        assert picked == router.replica_sessionmakers * 2
+        assert router.read_sessionmaker(sticky=True) is router.primary_sessionmaker
+    finally:
+        await router.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_over_http(tmp_path, monkeypatch):
+    # 写入只落在主库; 带粘滞 cookie 的读走主库, 不带的读走副本
+    import httpx
+    import app.database as database
+    from app.main import app
+
+    router = await _make_router(tmp_path)
+    monkeypatch.setattr(database, "router", router)
+    monkeypatch.setattr(database.settings, "sticky_seconds", 60)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            response = await client.post("/teams/", params={"name": "rw"})
+            team_id = response.json()["data"]["id"]
+            assert database.STICKY_COOKIE in response.cookies
+
+            assert (await client.get(f"/teams/{team_id}/members")).status_code == 200
+            client.cookies.clear()
+            assert (await client.get(f"/teams/{team_id}/members")).status_code == 404
+    finally:
+        await router.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_do_not_fill_user_cache(tmp_path, monkeypatch):
+    # 副本落后于主库: 其他客户端从副本读到已删除的用户, 不能写进缓存让粘滞客户端读到
+    import httpx
+    import app.cache as cache
+    import app.database as database
+    from app.main import app
+
+    router = await _make_router(tmp_path)
+    monkeypatch.setattr(database, "router", router)
+    monkeypatch.setattr(database.settings, "sticky_seconds", 60)
+    monkeypatch.setattr(cache, "user_cache", cache.LRUTTLCache())
+    for engine in [router.primary, *router.replicas]:
+        async with engine.begin() as conn:
+            await conn.execute(text("INSERT INTO user (id, name, status, role) VALUES (1, 'lag', 1, 0)"))
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as writer, \
+                httpx.AsyncClient(transport=transport, base_url="http://t") as reader:
+            assert (await writer.delete("/users/1")).status_code == 200
+            assert (await reader.get("/users/1")).status_code == 200
+            assert await cache.user_cache.get("user:1") is None
+            assert (await writer.get("/users/1")).status_code == 404
+
+            # 导出走只读副本, 粘滞窗口内走主库
+            assert b"lag" in (await reader.get("/users/export")).content
+            assert b"lag" not in (await writer.get("/users/export")).content
+    finally:
+        await router.dispose()
+
+
+@pytest.mark.asyncio
+async def test_add_team_members_rejects_unknown_users(tmp_path, monkeypatch):
+    # 请求级加载器一次查询团队和全部成员 id, 不存在的 id 返回 404
+    import httpx
+    import app.database as database
+    from app.main import app
+
+    router = await _make_router(tmp_path)
+    monkeypatch.setattr(database, "router", router)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            user_id = (await client.post("/users/bulk", json=[{"name": "member"}])).json()["data"][0]
+            team_id = (await client.post("/teams/", params={"name": "t"})).json()["data"]["id"]
+
+            response = await client.post(f"/teams/{team_id}/members", json=[user_id, 999])
+            assert response.status_code == 404 and "999" in response.json()["detail"]
+            response = await client.post(f"/teams/{team_id}/members", json=[user_id])
+            assert response.json()["data"] == 1
+            assert (await client.post("/teams/999/members", json=[user_id])).status_code == 404
+            assert (await client.post("/teams/", params={"name": "t2"}, json=[999])).status_code == 404
+    finally:
+        await router.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_fills_pools(tmp_path):
+    from app.warmup import warm_up
+
+    router = await _make_router(tmp_path)
+    try:
+        timings = await warm_up(router, pool_size=3)
+        assert set(timings) == {"configure_mappers", "fill_pool", "precompile"}
+        for engine in [router.primary, *router.replicas]:
+            assert engine.sync_engine.pool.checkedin() >= 3
+            assert engine.sync_engine.pool.checkedout() == 0
+    finally:
+        await router.dispose()
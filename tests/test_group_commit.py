@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.group_commit import GroupCommitWriter
+from app.models import Base, RoleEnum, StatusEnum, User
+
+
+async def _make_sessionmaker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'group_commit.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_creates_share_one_commit(tmp_path):
+    engine, maker = await _make_sessionmaker(tmp_path)
+    writer = GroupCommitWriter(maker, interval=0.05, batch_size=100)
+    writer.start()
+    try:
+        users = await asyncio.gather(*[
+            writer.submit(f"g{i}", StatusEnum.ACTIVE, RoleEnum.ADMIN) for i in range(30)
+        ])
+        assert writer.batches == 1 and writer.rows == 30
+        assert [u.name for u in users] == [f"g{i}" for i in range(30)]
+        assert len({u.id for u in users}) == 30
+        async with maker() as session:
+            for user in users:
+                stored = await session.get(User, user.id)
+                assert (stored.name, stored.role) == (user.name, RoleEnum.ADMIN)
+    finally:
+        await writer.stop()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_batch_size_flushes_before_interval(tmp_path):
+    engine, maker = await _make_sessionmaker(tmp_path)
+    writer = GroupCommitWriter(maker, interval=10, batch_size=5)
+    writer.start()
+    try:
+        users = await asyncio.wait_for(
+            asyncio.gather(*[writer.submit(f"b{i}") for i in range(10)]), timeout=5
+        )
+        assert len(users) == 10
+        assert writer.batches == 2
+    finally:
+        await writer.stop()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failing_row_is_isolated(tmp_path):
+    # name 非空约束失败: 整批回滚后逐行重试, 只有这一行报错
+    engine, maker = await _make_sessionmaker(tmp_path)
+    writer = GroupCommitWriter(maker, interval=0.05, batch_size=100)
+    writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.submit("ok1"), writer.submit(None), writer.submit("ok2"),
+            return_exceptions=True,
+        )
+        assert results[0].name == "ok1" and results[2].name == "ok2"
+        assert isinstance(results[1], Exception)
+        assert writer.fallbacks == 1 and writer.errors == 1 and writer.rows == 2
+        async with maker() as session:
+            assert (await session.exec(select(func.count()).select_from(User))).scalar() == 2
+    finally:
+        await writer.stop()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queued_rows(tmp_path):
+    engine, maker = await _make_sessionmaker(tmp_path)
+    writer = GroupCommitWriter(maker, interval=10, batch_size=100)
+    writer.start()
+    try:
+        pending = [asyncio.ensure_future(writer.submit(f"s{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        await writer.stop()
+        assert [u.name for u in await asyncio.gather(*pending)] == ["s0", "s1", "s2"]
+        with pytest.raises(RuntimeError):
+            await writer.submit("late")
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_503(tmp_path, monkeypatch):
+    # 组提交请求不经过准入控制, 队列满时快速失败而不是无限排队
+    import httpx
+    import app.main as main
+    from app.admission import BUSY_ERROR_CODE
+    from app.group_commit import GroupCommitQueueFull
+
+    engine, maker = await _make_sessionmaker(tmp_path)
+    writer = GroupCommitWriter(maker, interval=10, batch_size=100, max_queue=2)
+    writer.start()
+    monkeypatch.setattr(main, "user_writer", writer)
+    try:
+        # 第一个请求被后台任务取出后等待攒批, 之后的两个占满队列
+        pending = [asyncio.ensure_future(writer.submit(f"q{i}")) for i in range(3)]
+        while writer.stats()["queued"] < 2:
+            await asyncio.sleep(0.001)
+        with pytest.raises(GroupCommitQueueFull):
+            await writer.submit("overflow")
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            response = await client.post("/users/", params={"name": "overflow"})
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert response.json()["error_code"] == BUSY_ERROR_CODE
+        assert writer.rejected == 2
+
+        await writer.stop()
+        assert [u.name for u in await asyncio.gather(*pending)] == ["q0", "q1", "q2"]
+    finally:
+        await writer.stop()
+        await engine.dispose()
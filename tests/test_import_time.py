@@ -0,0 +1,27 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# app.main 冷启动导入耗时上限(秒), 主要花在 fastapi / sqlalchemy / pydantic 上
+IMPORT_TIME_BUDGET = 3.0
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _cumulative_import_seconds(module: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    pattern = re.compile(r"import time:\s*\d+\s*\|\s*(\d+)\s*\|\s*" + re.escape(module) + r"\s*$")
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            return int(match.group(1)) / 1e6
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+def test_app_import_time_budget():
+    assert _cumulative_import_seconds("app.main") < IMPORT_TIME_BUDGET
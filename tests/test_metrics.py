@@ -0,0 +1,52 @@
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import get_session, get_read_session
+from app.instrumentation import instrument_engine, db_queries
+from app.metrics import HistogramVec
+from app.models import Base
+
+
+def test_histogram_vec_render():
+    vec = HistogramVec("demo_seconds", "demo", ("route",), buckets=(0.1, 1))
+    vec.labels("/a").observe(0.05)
+    vec.labels("/a").observe(5)
+    text = vec.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{route="/a"} 2' in text
+
+
+@pytest.mark.asyncio
+async def test_per_route_sql_metrics():
+    from app.main import app
+
+    engine = instrument_engine(create_async_engine("sqlite+aiosqlite:///:memory:"))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_session():
+        async with async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            team_id = (await client.post("/teams/", params={"name": "m"})).json()["data"]["id"]
+            await client.get(f"/teams/{team_id}/members")
+            text = (await client.get("/metrics")).text
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    # 查询团队是否存在 + 查询成员, 共两条 SQL, 路由标签使用模板
+    histogram = db_queries.labels("GET", "/teams/{team_id}/members")
+    assert histogram.count >= 1 and histogram.sum >= 2
+    assert 'http_request_duration_seconds_count{method="GET",route="/teams/{team_id}/members",status="200"}' in text
@@ -0,0 +1,59 @@
+import pytest
+
+from app import serve
+from app.config import load_database_settings
+
+
+def test_plan_pool_leaves_room_for_restart():
+    # 4 个 worker + 平滑重启时的 1 个新 worker, 每份 20 个连接
+    assert serve.plan_pool(100, 4) == (15, 5)
+    assert serve.plan_pool(2, 1) == (1, 0)
+    with pytest.raises(ValueError):
+        serve.plan_pool(3, 4)
+
+
+def test_main_passes_pool_size_to_workers(monkeypatch):
+    calls = {}
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: calls.update(app=app, **kwargs))
+    # 先经 monkeypatch 设置, 测试结束后恢复 main() 写入的环境变量
+    monkeypatch.setenv("APP_DB_POOL_SIZE", "1")
+    monkeypatch.setenv("APP_DB_MAX_OVERFLOW", "1")
+    monkeypatch.setenv("APP_DB_USER_CACHE_TTL", "60")
+    serve.main(["--workers", "3", "--connection-budget", "40"])
+    assert calls["app"] == "app.main:app" and calls["workers"] == 3
+    settings = load_database_settings()
+    assert (settings.pool_size, settings.max_overflow) == (8, 2)
+
+
+def test_plan_user_cache_ttl_shortens_for_multiple_workers():
+    # 缓存不跨 worker 失效, 多 worker 时缩短 TTL; 显式指定时原样使用
+    assert serve.plan_user_cache_ttl(60, 1) == 60
+    assert serve.plan_user_cache_ttl(60, 4) == serve.MULTI_WORKER_USER_CACHE_TTL
+    assert serve.plan_user_cache_ttl(0.5, 4) == 0.5
+    assert serve.plan_user_cache_ttl(60, 4, requested=0) == 0
+
+
+def test_main_passes_user_cache_ttl_to_workers(monkeypatch):
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **kwargs: None)
+    monkeypatch.setenv("APP_DB_USER_CACHE_TTL", "60")
+    serve.main(["--workers", "4"])
+    assert load_database_settings().user_cache_ttl == serve.MULTI_WORKER_USER_CACHE_TTL
+    serve.main(["--workers", "4", "--user-cache-ttl", "0"])
+    assert load_database_settings().user_cache_ttl == 0
+
+
+def test_stale_entries_in_other_workers_expire_with_ttl():
+    # 模拟两个 worker 各自的缓存: 写入方删除了缓存, 另一个 worker 的旧值在 TTL 后过期
+    import asyncio
+    from app.cache import LRUTTLCache
+
+    async def scenario():
+        writer, other = LRUTTLCache(ttl=60), LRUTTLCache(ttl=0.01)
+        for cache in (writer, other):
+            await cache.set("user:1", {"role": "user"})
+        await writer.delete("user:1")
+        assert await other.get("user:1") == {"role": "user"}
+        await asyncio.sleep(0.02)
+        assert await other.get("user:1") is None
+
+    asyncio.run(scenario())
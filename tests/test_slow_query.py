@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.slow_query import SlowQueryLog, statement_shape
+
+
+def test_statement_shape_ignores_in_list_length():
+    a = statement_shape("SELECT * FROM user WHERE user.id IN (?, ?, ?)")
+    b = statement_shape("SELECT * FROM user\n WHERE user.id IN (?)")
+    assert a == b == "SELECT * FROM user WHERE user.id IN (...)"
+    assert statement_shape("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (...)"
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_recorded_with_explain(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'slow.db'}")
+    log = SlowQueryLog(maxlen=3)
+    log.attach(engine, threshold_seconds=0, explain_limit=1)  # 阈值为 0, 全部记录
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)"))
+        for i in range(3):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT v FROM t WHERE id = :id"), {"id": i})
+        await log.wait_explains()
+    finally:
+        await engine.dispose()
+
+    records = log.recent()
+    assert len(records) == 3  # 环形缓冲区只保留最近 3 条
+    selects = [r for r in records if r["statement"].startswith("SELECT")]
+    assert len(selects) == 3
+    explained = [r for r in selects if r["explain"]]
+    assert len(explained) == 1  # 同一形态只 EXPLAIN 一次
+    assert "SEARCH t USING INTEGER PRIMARY KEY" in str(explained[0]["explain"])
+    assert selects[0]["route"] is None